@@ -0,0 +1,248 @@
+"""Local OpenAI-compatible streaming server. Usage: python -m benchmarks.mock_server [--port 8765] [--rate 50]"""
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ["the", "translation", "of", "模型", "输出", "stream", "token", "，", "。", "text"]
+
+DEFAULT_SETTINGS = {
+    # Tokens streamed per response and how fast.
+    "tokens": 500,
+    "rate": 200.0,
+    "chunk_tokens": 1,
+    # Delay before the response headers, i.e. the provider's queueing/prefill time.
+    "ttft": 0.05,
+    # "incremental" sends new text only, "cumulative" resends everything so far.
+    "mode": "incremental",
+    # Pause the stream for stall_seconds once stall_at tokens have been sent.
+    "stall_at": 0,
+    "stall_seconds": 0.0,
+    # Every error_every-th request fails with error_status before streaming.
+    "error_every": 0,
+    "error_status": 500,
+    # Sent as Retry-After with errors when non-zero.
+    "retry_after": 0.0,
+    # Prompt tokens processed per second before the first token; 0 makes the prompt free.
+    "prefill_rate": 0.0,
+    # Serve a repeated system message from a prefix cache, reported as cached_tokens.
+    "prefix_cache": False,
+    # Cut responses off after this many tokens with finish_reason "length"; 0 means no limit.
+    "output_limit": 0,
+    # Extra delay before the first response on each new connection, like a TLS handshake.
+    "handshake": 0.0,
+}
+
+
+def make_text(tokens: int) -> list[str]:
+    return [WORDS[i % len(WORDS)] + " " for i in range(tokens)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self._handshake_pending = True
+
+    def _handshake(self):
+        if self._handshake_pending:
+            self._handshake_pending = False
+            time.sleep(self.server.settings()["handshake"])
+
+    def _send_json(self, status: int, body: dict, headers: dict | None = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _event(self, body: dict):
+        self._write_chunk(b"data: " + json.dumps(body, ensure_ascii=False).encode("utf-8") + b"\n\n")
+
+    def do_GET(self):
+        self._handshake()
+        if self.path == "/_stats":
+            self._send_json(200, self.server.snapshot())
+        elif self.path.endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        self._handshake()
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path == "/_config":
+            try:
+                self.server.configure(body)
+            except ValueError as e:
+                self._send_json(400, {"error": {"message": str(e)}})
+                return
+            self._send_json(200, self.server.snapshot())
+            return
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        settings, number = self.server.next_request()
+        if settings["error_every"] and number % settings["error_every"] == 0:
+            headers = {"Retry-After": f"{settings['retry_after']:g}"} if settings["retry_after"] else None
+            self._send_json(
+                settings["error_status"],
+                {"error": {"message": "mock failure", "type": "server_error"}},
+                headers,
+            )
+            return
+
+        messages = body.get("messages", [])
+        prompt_tokens = len(json.dumps(messages)) // 4
+        cached_tokens = self.server.cached_prefix(messages) if settings["prefix_cache"] else 0
+        prefill = (prompt_tokens - cached_tokens) / settings["prefill_rate"] if settings["prefill_rate"] > 0 else 0.0
+        time.sleep(settings["ttft"] + prefill)
+        tokens = make_text(settings["tokens"])
+        finish_reason = "stop"
+        if settings["output_limit"] and len(tokens) > settings["output_limit"]:
+            tokens = tokens[:settings["output_limit"]]
+            finish_reason = "length"
+        if not body.get("stream"):
+            text = "".join(tokens)
+            self._send_json(200, {
+                "id": "mock", "object": "chat.completion", "created": 0, "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": finish_reason}],
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        base = {"id": "mock", "object": "chat.completion.chunk", "created": 0, "model": body.get("model", "mock")}
+        step = max(int(settings["chunk_tokens"]), 1)
+        interval = step / settings["rate"] if settings["rate"] > 0 else 0.0
+        started = time.perf_counter()
+        sent = ""
+        try:
+            for i in range(0, len(tokens), step):
+                if settings["stall_at"] and i <= settings["stall_at"] < i + step:
+                    time.sleep(settings["stall_seconds"])
+                    started += settings["stall_seconds"]
+                piece = "".join(tokens[i:i + step])
+                sent += piece
+                content = sent if settings["mode"] == "cumulative" else piece
+                self._event({**base, "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}]})
+                # Pace against the start time so slow writes do not accumulate drift.
+                delay = started + (i + step) / step * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self._event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]})
+            if (body.get("stream_options") or {}).get("include_usage"):
+                self._event({**base, "choices": [], "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": prompt_tokens + len(tokens),
+                    "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                }})
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.note_aborted()
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, **settings):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self._lock = threading.Lock()
+        self._settings = dict(DEFAULT_SETTINGS)
+        self._settings.update(settings)
+        self._counter = itertools.count(1)
+        self._requests = 0
+        self._aborted = 0
+        self._prefixes: set[str] = set()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def configure(self, settings: dict):
+        with self._lock:
+            unknown = set(settings) - set(DEFAULT_SETTINGS)
+            if unknown:
+                raise ValueError(f"unknown mock settings: {sorted(unknown)}")
+            self._settings.update(settings)
+
+    def settings(self) -> dict:
+        with self._lock:
+            return dict(self._settings)
+
+    def next_request(self) -> tuple[dict, int]:
+        with self._lock:
+            self._requests += 1
+            return dict(self._settings), next(self._counter)
+
+    def cached_prefix(self, messages: list[dict]) -> int:
+        # Only a leading system message is cached, and only from its second use.
+        if not messages or messages[0].get("role") != "system":
+            return 0
+        prefix = json.dumps(messages[0])
+        with self._lock:
+            hit = prefix in self._prefixes
+            self._prefixes.add(prefix)
+        return len(prefix) // 4 if hit else 0
+
+    def note_aborted(self):
+        with self._lock:
+            self._aborted += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"settings": dict(self._settings), "requests": self._requests, "aborted": self._aborted}
+
+    def start(self) -> "MockServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.mock_server")
+    parser.add_argument("--port", type=int, default=8765, help="0 picks a free port")
+    for name, default in DEFAULT_SETTINGS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=type(default), default=default)
+    args = vars(parser.parse_args(argv))
+    server = MockServer(args.pop("port"), **args)
+    # The first line is machine readable so a parent process can find the port.
+    print(json.dumps({"base_url": server.base_url}), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
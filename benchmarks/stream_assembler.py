@@ -0,0 +1,88 @@
+"""Stream assembler micro-benchmark. Usage: python -m benchmarks.stream_assembler [--tokens 100000]"""
+
+import argparse
+import random
+import time
+
+from translator_app.stream_assembler import StreamAssembler
+
+WORDS = ["the", "translation", "of", "模型", "输出", "stream", "token", "，", "。", "\n"]
+
+
+def legacy_assemble(deltas) -> str:
+    # The delta handling TranslateWorker.run used before StreamAssembler existed.
+    accumulated = ""
+    for delta_content in deltas:
+        if len(delta_content) > len(accumulated) and delta_content.startswith(accumulated):
+            new_text = delta_content[len(accumulated):]
+        elif accumulated.endswith(delta_content):
+            continue
+        else:
+            new_text = delta_content
+        accumulated += new_text
+    return accumulated
+
+
+def assemble(deltas) -> str:
+    assembler = StreamAssembler()
+    for delta in deltas:
+        assembler.feed(delta)
+    return assembler.text()
+
+
+def make_tokens(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    tokens = [rng.choice(WORDS) + " " for _ in range(count)]
+    # An identical second delta is indistinguishable from a cumulative resend.
+    if len(tokens) > 1 and tokens[1] == tokens[0]:
+        tokens[1] = WORDS[(WORDS.index(tokens[0][:-1]) + 1) % len(WORDS)] + " "
+    return tokens
+
+
+def incremental_deltas(tokens: list[str], chunk_tokens: int) -> list[str]:
+    return ["".join(tokens[i:i + chunk_tokens]) for i in range(0, len(tokens), chunk_tokens)]
+
+
+def cumulative_deltas(tokens: list[str], chunk_tokens: int) -> list[str]:
+    full = "".join(tokens)
+    ends = []
+    length = 0
+    for i, token in enumerate(tokens, 1):
+        length += len(token)
+        if i % chunk_tokens == 0 or i == len(tokens):
+            ends.append(length)
+    return [full[:end] for end in ends]
+
+
+def timed(fn, deltas) -> tuple[float, str]:
+    started = time.perf_counter()
+    result = fn(deltas)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.stream_assembler")
+    parser.add_argument("--tokens", type=int, default=100_000, help="Tokens per synthetic stream")
+    parser.add_argument("--cumulative-chunk", type=int, default=20, help="Tokens between cumulative snapshots")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    tokens = make_tokens(args.tokens, args.seed)
+    expected = "".join(tokens)
+    cases = [
+        ("incremental", incremental_deltas(tokens, 1)),
+        ("cumulative", cumulative_deltas(tokens, args.cumulative_chunk)),
+    ]
+    print(f"{'stream':12} {'deltas':>8} {'legacy ms':>11} {'assembler ms':>13} {'speedup':>8}")
+    for name, deltas in cases:
+        legacy_ms, legacy_text = timed(legacy_assemble, deltas)
+        new_ms, new_text = timed(assemble, deltas)
+        if new_text != expected:
+            raise SystemExit(f"{name}: assembled text does not match the source stream")
+        note = "" if legacy_text == expected else "  (legacy dropped repeated deltas)"
+        print(f"{name:12} {len(deltas):8} {legacy_ms:11.1f} {new_ms:13.1f} {legacy_ms / new_ms:7.1f}x{note}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
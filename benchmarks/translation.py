@@ -0,0 +1,310 @@
+"""End-to-end translation benchmark. Usage: python -m benchmarks.translation [--runs 3] [--output FILE] [--compare FILE]"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Settings sent to the mock server for each scenario; see mock_server.DEFAULT_SETTINGS.
+SCENARIOS = {
+    "incremental": {"tokens": 2000, "rate": 2000.0, "chunk_tokens": 1, "mode": "incremental"},
+    "realistic": {"tokens": 300, "rate": 80.0, "chunk_tokens": 1, "mode": "incremental", "ttft": 0.3},
+    "large-chunks": {"tokens": 2000, "rate": 2000.0, "chunk_tokens": 25, "mode": "incremental"},
+    "cumulative": {"tokens": 2000, "rate": 2000.0, "chunk_tokens": 1, "mode": "cumulative"},
+    "stall": {"tokens": 300, "rate": 600.0, "chunk_tokens": 1, "stall_at": 100, "stall_seconds": 1.0},
+    "errors": {"tokens": 300, "rate": 600.0, "chunk_tokens": 1, "error_every": 2, "error_status": 500},
+    "rate-limited": {
+        "tokens": 300, "rate": 600.0, "chunk_tokens": 1, "error_every": 2, "error_status": 429, "retry_after": 0.2,
+    },
+}
+
+# Lower is better for everything except throughput.
+COMPARED = [
+    ("ttft_ms_p50", False),
+    ("tokens_per_s_p50", True),
+    ("cpu_ms_per_1k_tokens_p50", False),
+    ("frame_interval_p95_ms", False),
+    ("peak_rss_mb", False),
+]
+
+
+def _post(url: str, body: dict) -> dict:
+    request = urllib.request.Request(
+        url, json.dumps(body).encode("utf-8"), {"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def start_server() -> tuple[subprocess.Popen, str]:
+    # A separate process keeps the server's CPU out of the client measurements.
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_server", "--port", "0"],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    base_url = json.loads(process.stdout.readline())["base_url"]
+    return process, base_url
+
+
+def configure_server(base_url: str, settings: dict):
+    from benchmarks.mock_server import DEFAULT_SETTINGS
+
+    _post(base_url.rsplit("/v1", 1)[0] + "/_config", {**DEFAULT_SETTINGS, **settings})
+
+
+def peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def source_text() -> str:
+    # A fresh text per run keeps the translation memory and single-flight out of the way.
+    return f"Benchmark run {uuid.uuid4().hex}: please translate this short paragraph."
+
+
+def run_headless(config, tokens: int) -> dict:
+    from translator_app.engine import TranslationJob
+
+    first = []
+    job = TranslationJob(
+        config,
+        source_text(),
+        "英文",
+        on_text=lambda text: first or first.append(time.perf_counter()),
+    )
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    error = None
+    try:
+        job.run()
+    except Exception as e:
+        error = repr(e)
+    finished = time.perf_counter()
+    return {
+        "started": started,
+        "first": first[0] if first else None,
+        "finished": finished,
+        "cpu": time.process_time() - cpu_started,
+        "tokens": tokens,
+        "error": error,
+    }
+
+
+def run_gui(app, window, tokens: int) -> dict:
+    from PySide6.QtCore import QEventLoop, QTimer
+
+    loop = QEventLoop()
+    errors = []
+    window._edit_source.setPlainText(source_text())
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    # The live path reports errors in the status bar instead of a modal dialog.
+    window._translate(live=True)
+    window._worker.error_occurred.connect(errors.append)
+    window._worker.finished_signal.connect(loop.quit)
+    QTimer.singleShot(120_000, loop.quit)
+    loop.exec()
+    finished = time.perf_counter()
+    stats = window._renderer.stats()
+    return {
+        "started": started,
+        "first": window._renderer.first_chunk_time,
+        "finished": finished,
+        "cpu": time.process_time() - cpu_started,
+        "tokens": tokens,
+        "error": errors[0] if errors else None,
+        "frame_interval_p95_ms": stats["frame_interval_p95_ms"],
+        "frame_interval_max_ms": stats["frame_interval_max_ms"],
+        "document_edits": stats["document_edits"],
+    }
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def summarize(samples: list[dict]) -> dict:
+    ok = [s for s in samples if s["error"] is None and s["first"] is not None]
+    summary = {
+        "runs": len(samples),
+        "errors": len(samples) - len(ok),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if not ok:
+        return summary
+    ttft = [(s["first"] - s["started"]) * 1000 for s in ok]
+    rates = [s["tokens"] / max(s["finished"] - s["first"], 1e-9) for s in ok]
+    cpu = [s["cpu"] * 1000 / s["tokens"] * 1000 for s in ok]
+    summary.update({
+        "ttft_ms_p50": statistics.median(ttft),
+        "ttft_ms_p95": _percentile(ttft, 0.95),
+        "duration_ms_p50": statistics.median((s["finished"] - s["started"]) * 1000 for s in ok),
+        "tokens_per_s_p50": statistics.median(rates),
+        "cpu_ms_per_1k_tokens_p50": statistics.median(cpu),
+    })
+    if "frame_interval_p95_ms" in ok[0]:
+        summary.update({
+            "frame_interval_p95_ms": max(s["frame_interval_p95_ms"] for s in ok),
+            "frame_interval_max_ms": max(s["frame_interval_max_ms"] for s in ok),
+            "document_edits_p50": statistics.median(s["document_edits"] for s in ok),
+        })
+    return summary
+
+
+def compare(results: list[dict], baseline_path: str):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["scenario"], r["mode"]): r for r in json.load(f)["results"]}
+    print(f"\n{'scenario':14} {'mode':9} {'metric':26} {'baseline':>10} {'current':>10} {'change':>8}")
+    for result in results:
+        old = baseline.get((result["scenario"], result["mode"]))
+        if old is None:
+            continue
+        for metric, higher_is_better in COMPARED:
+            if result.get(metric) is None or not old.get(metric):
+                continue
+            change = (result[metric] - old[metric]) / old[metric] * 100
+            worse = change < -10 if higher_is_better else change > 10
+            print(
+                f"{result['scenario']:14} {result['mode']:9} {metric:26}"
+                f" {old[metric]:10.1f} {result[metric]:10.1f} {change:+7.1f}%{'  !' if worse else ''}"
+            )
+
+
+def _version() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_scenario(base_url: str, name: str, mode: str, runs: int) -> dict:
+    # Runs in a process of its own, so peak_rss_mb belongs to this scenario alone.
+    from translator_app.config import Config
+
+    config = Config()
+    app = window = None
+    if mode == "gui":
+        from PySide6.QtWidgets import QApplication
+        from translator_app.main_window import MainWindow
+
+        app = QApplication.instance() or QApplication([])
+        window = MainWindow()
+        window.show()
+    try:
+        # One untimed run pays for the lazy openai import and the first connection.
+        configure_server(base_url, {"tokens": 10})
+        run_gui(app, window, 10) if mode == "gui" else run_headless(config, 10)
+
+        settings = SCENARIOS[name]
+        configure_server(base_url, settings)
+        if mode == "gui":
+            samples = [run_gui(app, window, settings["tokens"]) for _ in range(runs)]
+        else:
+            samples = [run_headless(config, settings["tokens"]) for _ in range(runs)]
+        return {"scenario": name, "mode": mode, "settings": settings, **summarize(samples)}
+    finally:
+        if window is not None:
+            # Destroy the window while the QApplication still exists.
+            window.close()
+            window.deleteLater()
+            app.processEvents()
+
+
+def _run_worker(base_url: str, name: str, mode: str, runs: int) -> dict:
+    process = subprocess.run(
+        [sys.executable, "-m", "benchmarks.translation", "--runs", str(runs), "--worker", base_url, name, mode],
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.translation")
+    parser.add_argument("--runs", type=int, default=3, help="Translations per scenario and mode")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Only run these scenarios")
+    parser.add_argument("--mode", action="append", choices=["headless", "gui"], help="Only run these modes")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Print changes against a previous --output file")
+    parser.add_argument("--worker", nargs=3, metavar=("BASE_URL", "SCENARIO", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        base_url, name, mode = args.worker
+        print(json.dumps(run_scenario(base_url, name, mode, args.runs)))
+        return 0
+
+    # Keep the user's config, cache and translation memory out of the measurements.
+    # The scenario processes inherit this environment.
+    home = tempfile.mkdtemp(prefix="translator-bench-")
+    os.environ["HOME"] = os.environ["USERPROFILE"] = home
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    from translator_app.config import Config
+
+    process, base_url = start_server()
+    config = Config()
+    config.api_key = "benchmark"
+    config.base_url = base_url
+    config.model = "mock"
+    # Each scenario process loads its own Config, so write this one out now.
+    config.save()
+    config.flush()
+
+    results = []
+    try:
+        print(f"{'scenario':14} {'mode':9} {'ttft p50':>9} {'tok/s':>8} {'cpu/1k':>8} {'frame p95':>10} {'rss':>8} {'errors':>7}")
+        for name in args.scenario or list(SCENARIOS):
+            for mode in args.mode or ["headless", "gui"]:
+                summary = _run_worker(base_url, name, mode, args.runs)
+                results.append(summary)
+                frame = summary.get("frame_interval_p95_ms")
+                rss = summary.get("peak_rss_mb")
+                print(
+                    f"{name:14} {mode:9} {summary.get('ttft_ms_p50', 0):7.1f}ms"
+                    f" {summary.get('tokens_per_s_p50', 0):8.0f} {summary.get('cpu_ms_per_1k_tokens_p50', 0):6.1f}ms"
+                    f" {'' if frame is None else f'{frame:8.1f}ms':>10}"
+                    f" {'' if rss is None else f'{rss:6.0f}MB':>8} {summary['errors']:7}"
+                )
+    finally:
+        process.terminate()
+        process.wait()
+
+    report = {
+        "version": _version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "runs": args.runs,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
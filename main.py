@@ -1,4 +1,6 @@
+import os
 import sys
+import time
 
 from PySide6.QtWidgets import QApplication
 from PySide6.QtGui import QFont
@@ -7,6 +9,7 @@ from translator_app.main_window import MainWindow
 
 
 def main():
+    main_started = time.time()
     app = QApplication(sys.argv)
     app.setApplicationName("翻译助手")
 
@@ -17,6 +20,10 @@ def main():
 
     window = MainWindow()
     window.show()
+    if os.environ.get("TRANSLATOR_STARTUP_PROBE"):
+        from translator_app.startup import install_probe
+
+        install_probe(app, window, main_started)
     sys.exit(app.exec())
 
 
@@ -0,0 +1,59 @@
+from translator_app.stream_assembler import CUMULATIVE, INCREMENTAL, UNKNOWN, StreamAssembler
+
+
+def feed_all(assembler: StreamAssembler, deltas: list[str]) -> list[str]:
+    return [assembler.feed(delta) for delta in deltas]
+
+
+def test_detects_incremental_stream():
+    assembler = StreamAssembler()
+    assert feed_all(assembler, ["Hello", ", ", "world"]) == ["Hello", ", ", "world"]
+    assert assembler.mode == INCREMENTAL
+    assert assembler.text() == "Hello, world"
+    assert len(assembler) == len("Hello, world")
+
+
+def test_detects_cumulative_stream():
+    assembler = StreamAssembler()
+    assert feed_all(assembler, ["Hel", "Hello", "Hello, world"]) == ["Hel", "lo", ", world"]
+    assert assembler.mode == CUMULATIVE
+    assert assembler.text() == "Hello, world"
+
+
+def test_keeps_repeated_incremental_deltas():
+    assembler = StreamAssembler()
+    assert feed_all(assembler, ["\n\n", "\n\n", "Next", "\n\n", "\n\n"]) == ["\n\n", "\n\n", "Next", "\n\n", "\n\n"]
+    assert assembler.mode == INCREMENTAL
+    assert assembler.text() == "\n\n\n\nNext\n\n\n\n"
+
+
+def test_empty_first_delta_does_not_decide_mode():
+    assembler = StreamAssembler()
+    assert assembler.feed("") == ""
+    assert assembler.mode == UNKNOWN
+    assert feed_all(assembler, ["Hi", "Hi there"]) == ["Hi", " there"]
+    assert assembler.mode == CUMULATIVE
+    assert assembler.text() == "Hi there"
+
+
+def test_cumulative_snapshot_not_matching_tail_is_appended_whole():
+    assembler = StreamAssembler()
+    first = "a" * 100
+    feed_all(assembler, [first[:50], first])
+    assert assembler.mode == CUMULATIVE
+    # Longer than the output so far, but its end no longer lines up with the last 64 characters.
+    rewritten = "b" * 120
+    assert assembler.feed(rewritten) == rewritten
+    assert assembler.text() == first + rewritten
+    # The tail now ends with the appended text, so the next snapshot of it is matched again.
+    assert assembler.feed(first + rewritten + "c") == "c"
+    assert assembler.text() == first + rewritten + "c"
+
+
+def test_shorter_cumulative_snapshot_adds_nothing():
+    assembler = StreamAssembler()
+    feed_all(assembler, ["Good", "Good morning"])
+    assert assembler.feed("Good") == ""
+    assert assembler.feed("Good morning") == ""
+    assert assembler.text() == "Good morning"
+    assert assembler.feed("Good morning!") == "!"
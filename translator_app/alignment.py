@@ -0,0 +1,98 @@
+from difflib import SequenceMatcher
+
+from .segmenter import (
+    DEFAULT_SEGMENT_TOKENS,
+    Segment,
+    is_paragraph_break,
+    join_units,
+    pack_units,
+    split_paragraphs,
+    split_units,
+)
+
+
+class AlignedBlock:
+    def __init__(self, units: list[tuple[str, str]], translation: str | None = None):
+        self.units = units
+        self.translation = translation
+
+    @property
+    def segment(self) -> Segment:
+        return join_units(self.units)
+
+
+def _split_translation(block: AlignedBlock) -> list[AlignedBlock]:
+    # Keep paragraph granularity when the model preserved the paragraph count.
+    if len(block.units) == 1 or any(not is_paragraph_break(sep) for _, sep in block.units[:-1]):
+        return [block]
+    paragraphs = split_paragraphs(block.translation)
+    if len(paragraphs) != len(block.units):
+        return [block]
+    return [AlignedBlock([unit], paragraph) for unit, paragraph in zip(block.units, paragraphs)]
+
+
+class Alignment:
+    def __init__(self, key: tuple, blocks: list[AlignedBlock]):
+        self.key = key
+        self.blocks = blocks
+
+    @classmethod
+    def from_results(cls, key: tuple, blocks: list[AlignedBlock], results: list[str]) -> "Alignment":
+        aligned = []
+        for block, result in zip(blocks, results):
+            if block.translation is not None:
+                aligned.append(block)
+            else:
+                aligned.extend(_split_translation(AlignedBlock(block.units, result)))
+        return cls(key, aligned)
+
+
+def plan_blocks(
+    text: str,
+    previous: Alignment | None = None,
+    key: tuple | None = None,
+    max_tokens: int = DEFAULT_SEGMENT_TOKENS,
+) -> list[AlignedBlock]:
+    units = split_units(text, max_tokens)
+    reused: dict[int, AlignedBlock] = {}
+    if previous is not None and previous.key == key:
+        old_sources = []
+        starts = []
+        for index, block in enumerate(previous.blocks):
+            starts.append(len(old_sources))
+            old_sources.extend(unit for unit, _ in block.units)
+        start_of = {start: index for index, start in enumerate(starts)}
+        new_sources = [unit for unit, _ in units]
+        matcher = SequenceMatcher(None, old_sources, new_sources, autojunk=False)
+        for old, new, size in matcher.get_matching_blocks():
+            i = old
+            while i < old + size:
+                index = start_of.get(i)
+                length = len(previous.blocks[index].units) if index is not None else 0
+                if index is not None and i + length <= old + size:
+                    reused[new + i - old] = previous.blocks[index]
+                    i += length
+                else:
+                    i += 1
+
+    blocks: list[AlignedBlock] = []
+    changed: list[tuple[str, str]] = []
+
+    def flush_changed():
+        blocks.extend(AlignedBlock(group) for group in pack_units(changed, max_tokens))
+        changed.clear()
+
+    j = 0
+    while j < len(units):
+        block = reused.get(j)
+        if block is None:
+            changed.append(units[j])
+            j += 1
+            continue
+        flush_changed()
+        length = len(block.units)
+        # Separators come from the new text; only the translation is carried over.
+        blocks.append(AlignedBlock(units[j:j + length], block.translation))
+        j += length
+    flush_changed()
+    return blocks
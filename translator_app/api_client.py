@@ -1,100 +1,205 @@
+import asyncio
+import csv
 import traceback
+from concurrent.futures import Future
+from pathlib import Path
 
-from openai import OpenAI, APIConnectionError, APITimeoutError, APIStatusError
-from PySide6.QtCore import QThread, Signal
+from PySide6.QtCore import QObject, Signal
 
-from .config import Config, DEFAULT_SYSTEM_PROMPT
+from .cache import TranslationCache
+from .config import Config
+from .engine import TranslationJob, describe_error
+from .event_loop import event_loop
+from .formats import FileTranslation
+from .glossary import glossary
+from .large_file import DocumentTranslation
+from .memory import TranslationMemory
+from .segmenter import Segment
+from .warmup import WarmupResult, warmer
 
 
-class TranslateWorker(QThread):
+class TranslationHandle(QObject):
+    # Signals are emitted from the event loop thread and queued to the GUI thread.
     chunk_received = Signal(str)
     finished_signal = Signal()
     error_occurred = Signal(str)
+    segment_progress = Signal(int, int)
 
     def __init__(
         self,
         config: Config,
         text: str,
         target_lang: str,
+        cache: TranslationCache | None = None,
+        segments: list[Segment] | None = None,
+        memory: TranslationMemory | None = None,
+        prefilled: list[str | None] | None = None,
     ):
         super().__init__()
-        self._config = config
-        self._text = text
-        self._target_lang = target_lang
-        self._cancelled = False
+        self._future: Future | None = None
+        self._job = TranslationJob(
+            config,
+            text,
+            target_lang,
+            cache,
+            segments,
+            on_text=self._on_text,
+            on_progress=self._on_progress,
+            memory=memory,
+            prefilled=prefilled,
+        )
+
+    @property
+    def job(self) -> TranslationJob:
+        return self._job
+
+    def start(self):
+        self._future = self._job.start()
+        self._future.add_done_callback(self._on_done)
 
     def cancel(self):
-        self._cancelled = True
+        self._job.cancel()
 
-    def _build_system_prompt(self) -> str:
-        prompt_template = self._config.system_prompt or DEFAULT_SYSTEM_PROMPT
-        return prompt_template.format(
-            target_lang=self._target_lang,
-        )
+    def is_running(self) -> bool:
+        return self._future is not None and not self._future.done()
 
-    def run(self):
-        client = OpenAI(
-            api_key=self._config.api_key,
-            base_url=self._config.base_url,
-            timeout=60.0,
-        )
+    def _on_text(self, text: str):
+        # Nothing reaches the GUI once cancel() has returned.
+        if not self._job.cancelled:
+            self.chunk_received.emit(text)
 
-        try:
-            system_prompt = self._build_system_prompt()
-
-            stream = client.chat.completions.create(
-                model=self._config.model,
-                stream=True,
-                messages=[
-                    {"role": "user", "content": f"{system_prompt}\n\n{self._text}"},
-                ],
-            )
-
-            accumulated = ""
-            for chunk in stream:
-                if self._cancelled:
-                    stream.close()
-                    return
-
-                if not chunk.choices:
-                    continue
-
-                choice = chunk.choices[0]
-                if choice.finish_reason is not None:
-                    break
-
-                delta_content = choice.delta.content if choice.delta else None
-                if delta_content:
-                    if len(delta_content) > len(accumulated) and delta_content.startswith(accumulated):
-                        new_text = delta_content[len(accumulated):]
-                    elif accumulated.endswith(delta_content):
-                        continue
-                    else:
-                        new_text = delta_content
-                    accumulated += new_text
-                    self.chunk_received.emit(new_text)
+    def _on_progress(self, done: int, total: int):
+        if not self._job.cancelled:
+            self.segment_progress.emit(done, total)
 
-        except APITimeoutError:
-            self.error_occurred.emit("请求超时，请稍后重试。")
-            raise
-        except APIConnectionError:
-            self.error_occurred.emit("无法连接到 API 服务器，请检查网络或 Base URL 设置。")
-            raise
-        except APIStatusError as e:
-            self.error_occurred.emit(f"API 返回错误 ({e.status_code}): {e.message}")
-            raise
-        except Exception as e:
-            self.error_occurred.emit(f"请求异常: {e}")
-            traceback.print_exc()
-            raise
-        finally:
-            if not self._cancelled:
-                self.finished_signal.emit()
+    def _on_done(self, future: Future):
+        if future.cancelled() or self._job.cancelled:
+            return
+        error = future.exception()
+        if error is not None:
+            self.error_occurred.emit(describe_error(error))
+        self.finished_signal.emit()
+
+
+class _BackgroundTranslationHandle(QObject):
+    # Shared by the whole-file translations, which run on the loop and report per segment.
+    finished_signal = Signal()
+    error_occurred = Signal(str)
+    segment_progress = Signal(int, int)
+
+    def __init__(self, translation: DocumentTranslation | FileTranslation):
+        super().__init__()
+        self._future: Future | None = None
+        self._translation = translation
+        translation.on_progress = self._on_progress
+
+    def start(self):
+        self._future = self._translation.start()
+        self._future.add_done_callback(self._on_done)
 
+    def cancel(self):
+        self._translation.cancel()
+
+    def _on_progress(self, done: int, total: int):
+        if not self._translation.cancelled:
+            self.segment_progress.emit(done, total)
+
+    def _on_done(self, future: Future):
+        if future.cancelled() or self._translation.cancelled:
+            return
+        error = future.exception()
+        if error is not None:
+            self.error_occurred.emit(describe_error(error))
+        self.finished_signal.emit()
+
+
+class DocumentTranslationHandle(_BackgroundTranslationHandle):
+    segment_translated = Signal(int)
+
+    def __init__(self, translation: DocumentTranslation):
+        super().__init__(translation)
+        # The translation outlives the handle so that a later run resumes it.
+        translation.on_segment = self._on_segment
+
+    @property
+    def translation(self) -> DocumentTranslation:
+        return self._translation
+
+    def _on_segment(self, index: int):
+        if not self._translation.cancelled:
+            self.segment_translated.emit(index)
+
+
+class FileTranslationHandle(_BackgroundTranslationHandle):
+    @property
+    def translation(self) -> FileTranslation:
+        return self._translation
 
-class TestConnectionWorker(QThread):
+
+class WarmupHandle(QObject):
+    warmed = Signal(str)
+
+    def __init__(self, config: Config):
+        super().__init__()
+        self._config = config
+        warmer.on_warmed = self._on_warmed
+
+    def start(self):
+        future = warmer.start(self._config)
+        if future is not None:
+            future.add_done_callback(self._on_done)
+
+    def stop(self):
+        warmer.stop()
+
+    def _on_warmed(self, results: list[WarmupResult]):
+        warm = [r for r in results if r.error is None]
+        if not warm:
+            if results:
+                self.warmed.emit(f"预热失败: {results[0].error}")
+            return
+        parts = [f"已预热 {len(warm)} 个端点", f"连接 {max(r.connect_ms for r in warm):.0f}ms"]
+        completions = [r.completion_ms for r in warm if r.completion_ms is not None]
+        if completions:
+            parts.append(f"补全 {max(completions):.0f}ms")
+        self.warmed.emit(" · ".join(parts))
+
+    def _on_done(self, future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            traceback.print_exception(future.exception())
+
+
+class GlossaryImportHandle(QObject):
+    imported = Signal(int)
+    error_occurred = Signal(str)
+    finished = Signal()
+
+    def __init__(self, path: Path):
+        super().__init__()
+        self._path = path
+
+    def start(self):
+        # Parsing and compiling a large glossary takes seconds, so it runs off the GUI thread.
+        future = event_loop.submit(asyncio.to_thread(glossary.import_file, self._path))
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, future: Future):
+        if not future.cancelled():
+            error = future.exception()
+            if error is None:
+                self.imported.emit(future.result())
+            elif isinstance(error, (OSError, UnicodeDecodeError, csv.Error)):
+                self.error_occurred.emit(str(error))
+            else:
+                self.error_occurred.emit(f"导入失败: {error}")
+                traceback.print_exception(error)
+        self.finished.emit()
+
+
+class ConnectionTestHandle(QObject):
     success = Signal(str)
     error_occurred = Signal(str)
+    finished = Signal()
 
     def __init__(self, api_key: str, base_url: str, model: str):
         super().__init__()
@@ -102,30 +207,29 @@ class TestConnectionWorker(QThread):
         self._base_url = base_url
         self._model = model
 
-    def run(self):
-        client = OpenAI(
-            api_key=self._api_key,
-            base_url=self._base_url,
-            timeout=15.0,
-        )
+    def start(self):
+        event_loop.submit(self._run()).add_done_callback(lambda future: self.finished.emit())
+
+    async def _run(self):
+        from openai import APIConnectionError, APITimeoutError, APIStatusError, AsyncOpenAI
+
+        # The credentials being tested may never be saved, so the client is not pooled.
+        client = AsyncOpenAI(api_key=self._api_key, base_url=self._base_url, timeout=15.0, max_retries=0)
 
         try:
-            client.chat.completions.create(
-                model=self._model,
-                max_tokens=5,
-                messages=[{"role": "user", "content": "Hi"}],
-            )
+            async with client:
+                await client.chat.completions.create(
+                    model=self._model,
+                    max_tokens=5,
+                    messages=[{"role": "user", "content": "Hi"}],
+                )
             self.success.emit("连接成功！API 配置有效。")
         except APITimeoutError:
             self.error_occurred.emit("连接超时。")
-            raise
         except APIConnectionError:
             self.error_occurred.emit("无法连接到服务器，请检查 Base URL。")
-            raise
         except APIStatusError as e:
             self.error_occurred.emit(f"API 返回错误 ({e.status_code}): {e.message}")
-            raise
         except Exception as e:
             self.error_occurred.emit(f"连接失败: {e}")
             traceback.print_exc()
-            raise
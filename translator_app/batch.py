@@ -0,0 +1,262 @@
+import asyncio
+import json
+import re
+from concurrent.futures import CancelledError, Future
+from typing import Callable
+
+from .cache import TranslationCache, make_cache_key
+from .config import Config
+from .engine import (
+    MAX_PARALLEL_SEGMENTS,
+    TranslationJob,
+    build_system_prompt,
+    cache_prompt,
+    glossary_terms,
+    memory_reusable,
+    output_budget,
+)
+from .event_loop import event_loop
+from .memory import TranslationMemory
+from .metrics import RequestMetrics
+from .segmenter import estimate_tokens
+
+# Source tokens per request; the response is about as long again.
+BATCH_TOKENS = 1500
+MAX_BATCH_STRINGS = 100
+
+BATCH_INSTRUCTIONS = (
+    "下面是一个 JSON 对象，键是编号，值是待翻译的字符串。请逐个翻译每个值，"
+    "只输出一个键完全相同的 JSON 对象，不要合并、拆分或遗漏条目，不要添加任何解释。"
+    "占位符（如 {name}、%s、%1$d）、HTML 标签、行内代码和链接地址保持原样。"
+)
+
+_FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+# Placeholders, HTML tags, inline code and link targets must come back verbatim.
+_PLACEHOLDER = re.compile(
+    r"\{[^{}\s]*\}|%(?:\d+\$)?[-+ 0#]*\d*(?:\.\d+)?[sdifx@]|</?[a-zA-Z][^<>]*>|`[^`\n]+`|\]\([^()\s]*\)"
+)
+
+
+def build_batch_prompt(config: Config, target_lang: str) -> str:
+    return f"{build_system_prompt(config, target_lang)}\n\n{BATCH_INSTRUCTIONS}"
+
+
+def valid(source: str, translated) -> bool:
+    return (
+        isinstance(translated, str)
+        and bool(translated.strip())
+        and sorted(_PLACEHOLDER.findall(translated)) == sorted(_PLACEHOLDER.findall(source))
+    )
+
+
+def frame(strings: list[str]) -> str:
+    return json.dumps({str(i + 1): text for i, text in enumerate(strings)}, ensure_ascii=False, indent=0)
+
+
+def parse(response: str, strings: list[str]) -> list[str | None] | None:
+    # None when the response as a whole cannot be aligned with the request;
+    # otherwise one entry per string, None where that translation looks wrong.
+    text = _FENCE.sub("", response.strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict) or set(data) != {str(i + 1) for i in range(len(strings))}:
+        return None
+    results = []
+    for i, source in enumerate(strings):
+        translated = data[str(i + 1)]
+        results.append(translated if valid(source, translated) else None)
+    return results
+
+
+def pack(strings: list[str], max_tokens: int = BATCH_TOKENS) -> list[list[int]]:
+    batches: list[list[int]] = []
+    budget = 0
+    for i, text in enumerate(strings):
+        # As framed: quoted and escaped, plus its key and separators.
+        tokens = estimate_tokens(json.dumps(text, ensure_ascii=False)) + 4
+        if not batches or budget + tokens > max_tokens or len(batches[-1]) >= MAX_BATCH_STRINGS:
+            batches.append([])
+            budget = 0
+        batches[-1].append(i)
+        budget += tokens
+    return batches
+
+
+class BatchTranslation:
+    def __init__(
+        self,
+        config: Config,
+        strings: list[str],
+        target_lang: str,
+        cache: TranslationCache | None = None,
+        memory: TranslationMemory | None = None,
+        on_progress: Callable[[int, int], None] | None = None,
+        limit: asyncio.Semaphore | None = None,
+    ):
+        self._config = config
+        self._strings = strings
+        # Bounds the requests in flight; shared when several batches run side by side.
+        self._limit = limit
+        self._target_lang = target_lang
+        self._cache = cache
+        self._memory = memory
+        self._on_progress = on_progress or (lambda done, total: None)
+        self._cancelled = False
+        self._future: Future | None = None
+        self._completed = 0
+        self.results: list[str | None] = [None] * len(strings)
+        self.requests: list[RequestMetrics] = []
+        self.reused = 0
+        self.batches = 0
+        self.splits = 0
+        self.fallbacks = 0
+        # Strings whose translation lost a placeholder even when sent alone; left as None.
+        self.rejected = 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def start(self) -> Future:
+        self._future = event_loop.submit(self.run_async())
+        return self._future
+
+    def cancel(self):
+        self._cancelled = True
+        if self._future is not None:
+            self._future.cancel()
+
+    def run(self) -> list[str | None]:
+        try:
+            return self.start().result()
+        except CancelledError:
+            return self.results
+        except BaseException:
+            self.cancel()
+            raise
+
+    def _cache_key(self, text: str) -> str:
+        # Same key as a single-string translation, so both modes share the cache.
+        return make_cache_key(
+            self._config.model,
+            self._config.base_url,
+            cache_prompt(
+                build_system_prompt(self._config, self._target_lang),
+                glossary_terms(self._config, self._target_lang, text),
+            ),
+            self._target_lang,
+            text,
+        )
+
+    def _known(self, text: str) -> str | None:
+        if not text.strip():
+            return text
+        if self._cache is not None:
+            cached = self._cache.get(self._cache_key(text))
+            if cached is not None:
+                return cached
+        if self._memory is not None and memory_reusable(self._config, self._target_lang, text):
+            # Fuzzy matches are not worth much on strings this short.
+            match = self._memory.lookup(self._target_lang, text)
+            if match is not None and match.exact:
+                return match.target
+        return None
+
+    async def run_async(self) -> list[str | None]:
+        # Duplicates are translated once.
+        pending: dict[str, list[int]] = {}
+        for i, text in enumerate(self._strings):
+            known = self._known(text)
+            if known is not None:
+                self.results[i] = known
+                self.reused += 1
+            else:
+                pending.setdefault(text, []).append(i)
+        self._completed = len(self._strings) - sum(len(indices) for indices in pending.values())
+        self._on_progress(self._completed, len(self._strings))
+
+        unique = list(pending)
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(MAX_PARALLEL_SEGMENTS)
+
+        async def run_batch(batch: list[int]):
+            self.batches += 1
+            translated = await self._translate([unique[i] for i in batch])
+            for i, result in zip(batch, translated):
+                self._store(unique[i], pending[unique[i]], result)
+            if self._memory is not None:
+                self._memory.add_many(
+                    self._target_lang,
+                    [(unique[i], r) for i, r in zip(batch, translated) if r is not None],
+                )
+
+        # Smaller batches once the model has been seen to cut long replies off.
+        budget = min(BATCH_TOKENS, output_budget(self._config) or BATCH_TOKENS)
+        tasks = [asyncio.ensure_future(run_batch(batch)) for batch in pack(unique, budget)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return self.results
+
+    def _store(self, text: str, indices: list[int], result: str | None):
+        for i in indices:
+            self.results[i] = result
+        self._completed += len(indices)
+        if self._cache is not None and result is not None:
+            self._cache.put(self._cache_key(text), result)
+        self._on_progress(self._completed, len(self._strings))
+
+    async def _translate(self, strings: list[str]) -> list[str | None]:
+        if len(strings) == 1:
+            # A lone string needs no framing, and cannot be split any further.
+            self.fallbacks += 1
+            job = TranslationJob(self._config, strings[0], self._target_lang)
+            try:
+                async with self._limit:
+                    result = await job.run_async()
+            finally:
+                self.requests.extend(job.requests)
+            # Checked like a framed result; the caller keeps the source for a rejected one.
+            if not valid(strings[0], result):
+                self.rejected += 1
+                return [None]
+            return [result]
+
+        job = TranslationJob(
+            self._config,
+            frame(strings),
+            self._target_lang,
+            system_prompt=build_batch_prompt(self._config, self._target_lang),
+            # Split in the middle, the JSON object could not be parsed; batches are
+            # packed to fit the output budget instead.
+            splittable=False,
+        )
+        try:
+            # Held per request, not per batch, so the halves of a re-split batch count too.
+            async with self._limit:
+                response = await job.run_async()
+        finally:
+            self.requests.extend(job.requests)
+        results = parse(response or "", strings)
+        if results is None or all(result is None for result in results):
+            # Misaligned output: retry each half on its own.
+            self.splits += 1
+            middle = len(strings) // 2
+            halves = await asyncio.gather(self._translate(strings[:middle]), self._translate(strings[middle:]))
+            return halves[0] + halves[1]
+
+        # Only the strings that failed validation are sent again.
+        bad = [i for i, result in enumerate(results) if result is None]
+        if bad:
+            self.splits += 1
+            for i, result in zip(bad, await self._translate([strings[i] for i in bad])):
+                results[i] = result
+        return results
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import traceback
+from pathlib import Path
+
+from .config import CONFIG_DIR
+
+CACHE_FILE = CONFIG_DIR / "cache.sqlite3"
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+# Expired entries are swept at most this often instead of on every put.
+EXPIRE_INTERVAL = 3600.0
+# Access times of hits are buffered and written together once this many pile up.
+ACCESS_BATCH = 256
+
+
+def make_cache_key(
+    model: str,
+    base_url: str,
+    system_prompt: str,
+    target_lang: str,
+    text: str,
+) -> str:
+    payload = json.dumps(
+        [model, base_url, system_prompt, target_lang, text],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    def __init__(
+        self,
+        path: Path = CACHE_FILE,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age: float = DEFAULT_MAX_AGE,
+    ):
+        self._path = path
+        self._max_bytes = max_bytes
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        # Running sum of entry sizes, so a put never has to scan the table.
+        self._total = 0
+        self._expired_at = 0.0
+        self._accessed: dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if self._conn is None:
+            try:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self._path), check_same_thread=False)
+                # WAL with normal sync keeps a commit to an append instead of an fsync per put.
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS entries ("
+                    " key TEXT PRIMARY KEY,"
+                    " value TEXT NOT NULL,"
+                    " size INTEGER NOT NULL,"
+                    " created REAL NOT NULL,"
+                    " accessed REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+                )
+                conn.commit()
+                self._total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                self._conn = conn
+            except sqlite3.Error:
+                traceback.print_exc()
+        return self._conn
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            try:
+                row = conn.execute(
+                    "SELECT value, created, size FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] > self._max_age:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    conn.commit()
+                    self._total -= row[2]
+                    self._accessed.pop(key, None)
+                    row = None
+                if row is None:
+                    self.misses += 1
+                    return None
+                self._accessed[key] = now
+                if len(self._accessed) >= ACCESS_BATCH:
+                    self._write_accessed(conn)
+                    conn.commit()
+            except sqlite3.Error:
+                traceback.print_exc()
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str):
+        size = len(value.encode("utf-8"))
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            now = time.time()
+            try:
+                old = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, created, accessed)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now),
+                )
+                self._accessed.pop(key, None)
+                self._total += size - (old[0] if old else 0)
+                self._evict(conn, now)
+                conn.commit()
+            except sqlite3.Error:
+                traceback.print_exc()
+                # The running total may no longer match the table.
+                self._total = self._sum(conn)
+
+    def _sum(self, conn: sqlite3.Connection) -> int:
+        try:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        except sqlite3.Error:
+            traceback.print_exc()
+            return self._total
+
+    def _write_accessed(self, conn: sqlite3.Connection):
+        conn.executemany(
+            "UPDATE entries SET accessed = ? WHERE key = ?",
+            [(accessed, key) for key, accessed in self._accessed.items()],
+        )
+        self._accessed.clear()
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        if now - self._expired_at >= EXPIRE_INTERVAL:
+            self._expired_at = now
+            cutoff = now - self._max_age
+            expired = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries WHERE created < ?", (cutoff,)
+            ).fetchone()[0]
+            if expired:
+                conn.execute("DELETE FROM entries WHERE created < ?", (cutoff,))
+                self._total -= expired
+        if self._total <= self._max_bytes:
+            return
+        # Least recently used first; the index lets the scan stop as soon as enough is freed.
+        self._write_accessed(conn)
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if self._total <= self._max_bytes:
+                break
+            stale.append((key,))
+            self._total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute("DELETE FROM entries")
+                conn.commit()
+                self._total = 0
+                self._accessed.clear()
+            except sqlite3.Error:
+                traceback.print_exc()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._write_accessed(self._conn)
+                    self._conn.commit()
+                except sqlite3.Error:
+                    traceback.print_exc()
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,281 @@
+"""Headless translator. Usage: python -m translator_app.cli [-t 英文] [-o DIR] [FILE|GLOB ...]"""
+
+import argparse
+import asyncio
+import glob
+import io
+import sys
+from pathlib import Path
+
+from .batch import BatchTranslation
+from .cache import TranslationCache
+from .config import Config
+from .engine import TranslationJob, describe_error
+from .event_loop import event_loop
+from .formats import FileTranslation, is_structured
+from .memory import TranslationMemory
+from .metrics import cache_hit_ratio
+from .scheduler import scheduler
+from .segmenter import split_segments
+from .single_flight import single_flight
+
+
+def _expand_inputs(patterns: list[str]) -> list[str]:
+    paths = []
+    for pattern in patterns:
+        if pattern == "-":
+            paths.append(pattern)
+            continue
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches and not glob.has_magic(pattern):
+            matches = [pattern]
+        paths.extend(m for m in matches if m == pattern or Path(m).is_file())
+    return paths
+
+
+def _read_input(path: str) -> str:
+    if path == "-":
+        return sys.stdin.read()
+    return Path(path).read_text(encoding="utf-8")
+
+
+def _make_job(args, config: Config, cache: TranslationCache | None, text: str, on_text=None):
+    return TranslationJob(
+        config,
+        text,
+        args.target,
+        cache,
+        split_segments(text),
+        on_text=on_text,
+        memory=args.memory,
+    )
+
+
+def _report(args, path: str, job: TranslationJob):
+    if not args.stats:
+        return
+    if args.memory is not None:
+        print(
+            f"{path}: translation memory {job.memory_exact}/{job.segment_count} exact,"
+            f" {job.memory_sentences} sentences reused, {job.memory_fuzzy} fuzzy",
+            file=sys.stderr,
+        )
+    done = [r for r in job.requests if r.status == "ok"]
+    if done:
+        ttft = [r.ttft_ms for r in done if r.ttft_ms is not None]
+        tokens = sum(r.completion_tokens or 0 for r in done)
+        seconds = sum(r.duration_ms for r in done) / 1000
+        print(
+            f"{path}: {len(done)} requests, connect {max(r.connect_ms for r in done):.0f} ms,"
+            f" first token {min(ttft) if ttft else 0:.0f} ms, {tokens} tokens"
+            f"{' (estimated)' if any(r.tokens_estimated for r in done) else ''},"
+            f" {tokens / seconds if seconds else 0:.0f} tokens/s",
+            file=sys.stderr,
+        )
+        ratio = cache_hit_ratio(done)
+        if ratio is not None:
+            print(f"{path}: prompt cache {ratio:.0%} of prompt tokens", file=sys.stderr)
+    if job.coalesced or job.retries:
+        print(
+            f"{path}: {job.coalesced} requests joined identical in-flight ones, {job.retries} retries",
+            file=sys.stderr,
+        )
+    if job.continuations:
+        print(f"{path}: {job.continuations} continuations after output was cut off", file=sys.stderr)
+    if job.glossary_terms:
+        print(f"{path}: {job.glossary_terms} glossary terms sent", file=sys.stderr)
+
+
+def _report_file(args, path: str, translation: FileTranslation):
+    if not args.stats:
+        return
+    print(
+        f"{path}: {translation.found} text nodes, {translation.reused} reused,"
+        f" {translation.batches} batches, {len(translation.requests)} requests"
+        f"{f', {translation.untranslated} left untranslated' if translation.untranslated else ''}",
+        file=sys.stderr,
+    )
+
+
+def _structured(args, path: str) -> bool:
+    return not args.plain and path != "-" and is_structured(path)
+
+
+def _stream_one(args, config: Config, cache: TranslationCache | None, path: str) -> int:
+    if _structured(args, path):
+        # Written to stdout window by window as the translations come in.
+        translation = FileTranslation(config, path, "-", args.target, cache, args.memory)
+        try:
+            translation.run()
+        except Exception as e:
+            print(f"\n{path}: {describe_error(e)}", file=sys.stderr)
+            return 1
+        _report_file(args, path, translation)
+        return 0
+
+    text = _read_input(path).strip()
+    if not text:
+        return 0
+
+    def write(chunk: str):
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+
+    job = _make_job(args, config, cache, text, write)
+    try:
+        job.run()
+    except Exception as e:
+        print(f"\n{path}: {describe_error(e)}", file=sys.stderr)
+        return 1
+    sys.stdout.write("\n")
+    _report(args, path, job)
+    return 0
+
+
+async def _translate_strings(args, config: Config, cache: TranslationCache | None, path: str, text: str) -> str:
+    # One string per line.
+    strings = text.split("\n")
+    batch = BatchTranslation(config, strings, args.target, cache, args.memory)
+    results = await batch.run_async()
+    if args.stats:
+        print(
+            f"{path}: {len(strings)} strings, {batch.reused} reused, {batch.batches} batches,"
+            f" {batch.splits} re-sent after misaligned output, {batch.fallbacks} sent alone,"
+            f" {batch.rejected} left untranslated, {len(batch.requests)} requests",
+            file=sys.stderr,
+        )
+        ratio = cache_hit_ratio([r for r in batch.requests if r.status == "ok"])
+        if ratio is not None:
+            print(f"{path}: prompt cache {ratio:.0%} of prompt tokens", file=sys.stderr)
+    # Strings without a usable translation are written as they were.
+    return "\n".join(source if result is None else result for source, result in zip(strings, results))
+
+
+async def _translate_structured(args, config: Config, cache: TranslationCache | None, path: str, limit) -> str:
+    output = Path(args.output_dir) / Path(path).name if args.output_dir else io.StringIO()
+    if args.output_dir:
+        output.parent.mkdir(parents=True, exist_ok=True)
+    translation = FileTranslation(config, path, output, args.target, cache, args.memory)
+    async with limit:
+        await translation.run_async()
+    _report_file(args, path, translation)
+    return "" if args.output_dir else output.getvalue()
+
+
+async def _translate_file(args, config: Config, cache: TranslationCache | None, path: str, limit) -> str:
+    if _structured(args, path):
+        return await _translate_structured(args, config, cache, path, limit)
+    text = _read_input(path).strip()
+    if not text:
+        return ""
+    async with limit:
+        if args.batch:
+            result = await _translate_strings(args, config, cache, path, text)
+        else:
+            job = _make_job(args, config, cache, text)
+            result = await job.run_async() or ""
+            _report(args, path, job)
+    if args.output_dir:
+        output = Path(args.output_dir) / Path(path).name
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(result + "\n", encoding="utf-8")
+    return result
+
+
+async def _translate_all(args, config: Config, cache: TranslationCache | None, paths: list[str]) -> list:
+    limit = asyncio.Semaphore(args.jobs)
+    return await asyncio.gather(
+        *[_translate_file(args, config, cache, path, limit) for path in paths],
+        return_exceptions=True,
+    )
+
+
+def _translate_many(args, config: Config, cache: TranslationCache | None, paths: list[str]) -> int:
+    status = 0
+    for path, result in zip(paths, event_loop.run(_translate_all(args, config, cache, paths))):
+        if isinstance(result, Exception):
+            print(f"{path}: {describe_error(result)}", file=sys.stderr)
+            status = 1
+            continue
+        if args.output_dir:
+            print(f"{path} -> {Path(args.output_dir) / Path(path).name}", file=sys.stderr)
+        else:
+            sys.stdout.write(f"==> {path} <==\n{result}\n\n")
+            sys.stdout.flush()
+    if args.stats:
+        flights = single_flight.stats()
+        print(
+            f"requests: {flights['started']} sent, {flights['coalesced']} coalesced with identical in-flight requests",
+            file=sys.stderr,
+        )
+        queue = scheduler.stats()
+        print(
+            f"scheduler: {queue['retries']} retries ({queue['rate_limited']} rate limited),"
+            f" queue wait {queue['wait_ms_avg']:.0f} ms avg / {queue['wait_ms_max']:.0f} ms max",
+            file=sys.stderr,
+        )
+    return status
+
+
+def main(argv: list[str] | None = None) -> int:
+    config = Config()
+
+    parser = argparse.ArgumentParser(prog="python -m translator_app.cli")
+    parser.add_argument("inputs", nargs="*", help="Files or glob patterns; reads stdin when omitted or '-'")
+    parser.add_argument("-t", "--target", default=config.target_lang, help="Target language")
+    parser.add_argument("-m", "--model", help="Override the configured model")
+    parser.add_argument("-o", "--output-dir", help="Write each translated file into this directory")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="Files translated concurrently")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the translation cache")
+    parser.add_argument("--no-memory", action="store_true", help="Do not use the translation memory")
+    parser.add_argument("--no-glossary", action="store_true", help="Do not send glossary terms")
+    parser.add_argument("--stats", action="store_true", help="Print per-file statistics to stderr")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Translate each line on its own, packing many per request",
+    )
+    parser.add_argument(
+        "--plain",
+        action="store_true",
+        help="Translate .srt/.po/.json/.md files as plain text instead of only their text nodes",
+    )
+    parser.add_argument(
+        "--system-message",
+        action="store_true",
+        help="Send the prompt as a separate system message so providers can cache it",
+    )
+    args = parser.parse_args(argv)
+
+    if args.model:
+        config.model = args.model
+    if args.system_message:
+        config.system_message = True
+    if args.no_glossary:
+        config.use_glossary = False
+    if not config.api_key:
+        print("API Key is not configured; set it in the GUI settings first.", file=sys.stderr)
+        return 2
+
+    paths = _expand_inputs(args.inputs or ["-"])
+    if not paths:
+        print("No input files matched.", file=sys.stderr)
+        return 2
+
+    cache = None if args.no_cache else TranslationCache()
+    args.memory = None if args.no_memory else TranslationMemory()
+    try:
+        if len(paths) == 1 and not args.output_dir and not args.batch:
+            return _stream_one(args, config, cache, paths[0])
+        return _translate_many(args, config, cache, paths)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if cache is not None:
+            cache.close()
+        if args.memory is not None:
+            args.memory.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,135 @@
+import asyncio
+import contextlib
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from .event_loop import event_loop
+from .metrics import current_request
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+ClientKey = tuple[str, str, float]
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.last_request = 0.0
+
+    async def on_request(self, request):
+        with self._lock:
+            self.requests += 1
+            self.last_request = time.monotonic()
+        request.extensions["trace"] = self._trace
+
+    async def _trace(self, event_name: str, info: dict):
+        metrics = current_request.get()
+        if event_name == "connection.connect_tcp.started":
+            if metrics is not None:
+                metrics.on_connect_started()
+        elif event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections += 1
+            if metrics is not None:
+                metrics.on_connected()
+        elif event_name == "connection.start_tls.complete":
+            if metrics is not None:
+                metrics.on_connected()
+
+
+class ClientManager:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: dict[ClientKey, "AsyncOpenAI"] = {}
+        self._stats: dict[ClientKey, PoolStats] = {}
+        # Requests in flight per client, and replaced clients waiting for theirs to finish.
+        self._active: dict["AsyncOpenAI", int] = {}
+        self._retired: set["AsyncOpenAI"] = set()
+
+    def get(self, base_url: str, api_key: str, timeout: float) -> "AsyncOpenAI":
+        # Clients are bound to the shared event loop; only call this from there.
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        from .transport import KeepAliveTransport
+
+        key = (base_url, api_key, timeout)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                stats = self._stats.setdefault(key, PoolStats())
+                client = AsyncOpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    timeout=timeout,
+                    # Retries are scheduled by scheduler.Scheduler, which knows about rate limits and failover.
+                    max_retries=0,
+                    http_client=DefaultAsyncHttpxClient(
+                        transport=KeepAliveTransport(),
+                        event_hooks={"request": [stats.on_request]},
+                    ),
+                )
+                # The SDK imports its resource modules on first access; do it here rather
+                # than inside the first request, whose TTFT would otherwise include it.
+                client.chat.completions
+                self._clients[key] = client
+            return client
+
+    @contextlib.asynccontextmanager
+    async def lease(self, base_url: str, api_key: str, timeout: float):
+        client = self.get(base_url, api_key, timeout)
+        with self._lock:
+            self._active[client] = self._active.get(client, 0) + 1
+        try:
+            yield client
+        finally:
+            with self._lock:
+                self._active[client] -= 1
+                close = not self._active[client] and client in self._retired
+                if not self._active[client]:
+                    del self._active[client]
+                if close:
+                    self._retired.discard(client)
+            if close:
+                # Not awaited: this may run while the request is being cancelled.
+                asyncio.ensure_future(client.close())
+
+    def idle_seconds(self, base_url: str, api_key: str, timeout: float) -> float:
+        with self._lock:
+            stats = self._stats.get((base_url, api_key, timeout))
+        if stats is None or not stats.last_request:
+            return float("inf")
+        return time.monotonic() - stats.last_request
+
+    def reset(self, keep: set[ClientKey] | frozenset = frozenset()):
+        # Drops every client not in keep. Idle ones are closed now; the others once
+        # their streaming requests have finished, so a settings change does not cut them off.
+        idle = []
+        with self._lock:
+            for key in [key for key in self._clients if key not in keep]:
+                client = self._clients.pop(key)
+                self._stats.pop(key, None)
+                if client in self._active:
+                    self._retired.add(client)
+                else:
+                    idle.append(client)
+        for client in idle:
+            event_loop.submit(client.close())
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = list(self._stats.values())
+            clients = len(self._clients)
+        requests = sum(s.requests for s in stats)
+        connections = sum(s.connections for s in stats)
+        return {
+            "clients": clients,
+            "requests": requests,
+            "connections": connections,
+            "reused": max(requests - connections, 0),
+        }
+
+
+client_manager = ClientManager()
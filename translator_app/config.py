@@ -1,4 +1,7 @@
+import atexit
 import json
+import os
+import threading
 import traceback
 from pathlib import Path
 
@@ -13,16 +16,42 @@ DEFAULTS = {
     "model": "gpt-4o-mini",
     "system_prompt": DEFAULT_SYSTEM_PROMPT,
     "target_lang": "英文",
+    "multi_targets": [],
+    "live_translate": False,
+    # Requests and tokens per minute allowed on the primary endpoint; 0 means unlimited.
+    "rpm": 0,
+    "tpm": 0,
+    # Extra OpenAI-compatible endpoints: {base_url, api_key, model, weight, rpm, tpm, enabled}.
+    "endpoints": [],
+    "hedge_requests": False,
+    # Send the prompt as its own system message so providers can cache it as a prefix.
+    "system_message": False,
+    # Open connections (and optionally load the model) at startup and after settings changes.
+    "warmup": True,
+    "warmup_completion": False,
+    # Seconds of idleness after which an endpoint is warmed again; 0 turns keep-warm off.
+    "keep_warm_interval": 0,
+    # Send the glossary entries found in each text along with it.
+    "use_glossary": True,
 }
 
 CONFIG_DIR = Path.home() / ".translator"
 CONFIG_FILE = CONFIG_DIR / "config.json"
 
+# Changes are written this many seconds after the first unsaved one.
+SAVE_DELAY = 1.0
+
 
 class Config:
     def __init__(self):
         self._data: dict = dict(DEFAULTS)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._dirty = False
+        self._written: str | None = None
         self.load()
+        atexit.register(self.flush)
 
     def load(self):
         if CONFIG_FILE.exists():
@@ -32,19 +61,59 @@ class Config:
                 for key in DEFAULTS:
                     if key in saved:
                         self._data[key] = saved[key]
+                self._written = self._serialize()
             except (json.JSONDecodeError, OSError):
                 traceback.print_exc()
 
+    def _serialize(self) -> str:
+        with self._lock:
+            return json.dumps(self._data, ensure_ascii=False, indent=2)
+
     def save(self):
-        CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(self._data, f, ensure_ascii=False, indent=2)
+        # Write-behind: coalesce changes and write them from a background thread.
+        with self._lock:
+            self._dirty = True
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(SAVE_DELAY, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        # Only changes passed to save() are written; temporary overrides such as the CLI's --model are not.
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            dirty, self._dirty = self._dirty, False
+        if not dirty:
+            return
+        with self._write_lock:
+            data = self._serialize()
+            if data == self._written:
+                return
+            # Write a temp file and rename it over the old one so a crash never leaves half a config.
+            tmp = CONFIG_FILE.with_name(f"{CONFIG_FILE.name}.{os.getpid()}.tmp")
+            try:
+                CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, CONFIG_FILE)
+                self._written = data
+            except OSError:
+                traceback.print_exc()
+                # Kept pending, so the next save() or the exit flush tries again.
+                with self._lock:
+                    self._dirty = True
 
     def get(self, key: str):
         return self._data.get(key, DEFAULTS.get(key))
 
     def set(self, key: str, value):
-        self._data[key] = value
+        with self._lock:
+            self._data[key] = value
 
     @property
     def api_key(self) -> str:
@@ -85,3 +154,91 @@ class Config:
     @target_lang.setter
     def target_lang(self, value: str):
         self.set("target_lang", value)
+
+    @property
+    def multi_targets(self) -> list[str]:
+        return list(self.get("multi_targets"))
+
+    @multi_targets.setter
+    def multi_targets(self, value: list[str]):
+        self.set("multi_targets", list(value))
+
+    @property
+    def live_translate(self) -> bool:
+        return bool(self.get("live_translate"))
+
+    @live_translate.setter
+    def live_translate(self, value: bool):
+        self.set("live_translate", bool(value))
+
+    @property
+    def endpoints(self) -> list[dict]:
+        return [dict(entry) for entry in self.get("endpoints")]
+
+    @endpoints.setter
+    def endpoints(self, value: list[dict]):
+        self.set("endpoints", [dict(entry) for entry in value])
+
+    @property
+    def hedge_requests(self) -> bool:
+        return bool(self.get("hedge_requests"))
+
+    @hedge_requests.setter
+    def hedge_requests(self, value: bool):
+        self.set("hedge_requests", bool(value))
+
+    @property
+    def rpm(self) -> int:
+        return int(self.get("rpm"))
+
+    @rpm.setter
+    def rpm(self, value: int):
+        self.set("rpm", int(value))
+
+    @property
+    def tpm(self) -> int:
+        return int(self.get("tpm"))
+
+    @tpm.setter
+    def tpm(self, value: int):
+        self.set("tpm", int(value))
+
+    @property
+    def system_message(self) -> bool:
+        return bool(self.get("system_message"))
+
+    @system_message.setter
+    def system_message(self, value: bool):
+        self.set("system_message", bool(value))
+
+    @property
+    def warmup(self) -> bool:
+        return bool(self.get("warmup"))
+
+    @warmup.setter
+    def warmup(self, value: bool):
+        self.set("warmup", bool(value))
+
+    @property
+    def warmup_completion(self) -> bool:
+        return bool(self.get("warmup_completion"))
+
+    @warmup_completion.setter
+    def warmup_completion(self, value: bool):
+        self.set("warmup_completion", bool(value))
+
+    @property
+    def keep_warm_interval(self) -> int:
+        return int(self.get("keep_warm_interval"))
+
+    @keep_warm_interval.setter
+    def keep_warm_interval(self, value: int):
+        self.set("keep_warm_interval", int(value))
+
+    @property
+    def use_glossary(self) -> bool:
+        return bool(self.get("use_glossary"))
+
+    @use_glossary.setter
+    def use_glossary(self, value: bool):
+        self.set("use_glossary", bool(value))
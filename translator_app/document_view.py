@@ -0,0 +1,151 @@
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, Signal
+from PySide6.QtWidgets import (
+    QAbstractItemView, QHBoxLayout, QHeaderView, QLabel, QPlainTextEdit,
+    QPushButton, QSplitter, QTableView, QVBoxLayout, QWidget,
+)
+
+from .large_file import MappedDocument
+
+# Table cells only ever show the start of a segment; the detail pane shows all of it.
+PREVIEW_CHARS = 300
+PREVIEW_LINES = 3
+
+
+class SegmentTableModel(QAbstractTableModel):
+    def __init__(self, document: MappedDocument, parent=None):
+        super().__init__(parent)
+        self._document = document
+        self._results: list[str | None] = [None] * len(document)
+
+    def set_results(self, results: list[str | None]):
+        self._results = results
+        if self._results:
+            self.dataChanged.emit(self.index(0, 1), self.index(len(self._results) - 1, 1))
+
+    def segment_changed(self, row: int):
+        self.dataChanged.emit(self.index(row, 1), self.index(row, 1))
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._document)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else 2
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return ["原文", "译文"][section]
+        return str(section + 1)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        # Only called for visible cells, so the file is decoded a screenful at a time.
+        if index.column() == 0:
+            return self._document.preview(index.row(), PREVIEW_CHARS)
+        result = self._results[index.row()]
+        return result[:PREVIEW_CHARS] if result is not None else ""
+
+
+class DocumentView(QWidget):
+    export_requested = Signal()
+    close_requested = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._document: MappedDocument | None = None
+        self._model: SegmentTableModel | None = None
+        self._results: list[str | None] = []
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(6)
+
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        self._table = QTableView()
+        self._table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self._table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self._table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self._table.setWordWrap(True)
+        self._table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        # Fixed row heights keep the view from measuring every row up front.
+        header = self._table.verticalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        header.setDefaultSectionSize(self.fontMetrics().lineSpacing() * PREVIEW_LINES + 8)
+        splitter.addWidget(self._table)
+
+        detail = QWidget()
+        detail_layout = QHBoxLayout(detail)
+        detail_layout.setContentsMargins(0, 0, 0, 0)
+        self._detail_source = QPlainTextEdit()
+        self._detail_source.setReadOnly(True)
+        self._detail_source.setPlaceholderText("选择一段查看完整原文")
+        self._detail_result = QPlainTextEdit()
+        self._detail_result.setReadOnly(True)
+        self._detail_result.setPlaceholderText("选择一段查看完整译文")
+        detail_layout.addWidget(self._detail_source)
+        detail_layout.addWidget(self._detail_result)
+        splitter.addWidget(detail)
+        splitter.setStretchFactor(0, 3)
+        splitter.setStretchFactor(1, 1)
+        layout.addWidget(splitter, 1)
+
+        btn_row = QHBoxLayout()
+        self._label = QLabel()
+        btn_row.addWidget(self._label)
+        btn_row.addStretch()
+        self._btn_export = QPushButton("导出")
+        self._btn_export.setProperty("secondary", True)
+        self._btn_export.setFixedWidth(70)
+        self._btn_export.clicked.connect(self.export_requested)
+        btn_row.addWidget(self._btn_export)
+        self._btn_close = QPushButton("关闭文件")
+        self._btn_close.setProperty("secondary", True)
+        self._btn_close.setFixedWidth(90)
+        self._btn_close.clicked.connect(self.close_requested)
+        btn_row.addWidget(self._btn_close)
+        layout.addLayout(btn_row)
+
+    def set_document(self, document: MappedDocument | None):
+        self._document = document
+        self._results = []
+        old = self._model
+        self._model = SegmentTableModel(document, self) if document is not None else None
+        self._table.setModel(self._model)
+        if old is not None:
+            old.deleteLater()
+        if self._model is not None:
+            self._table.selectionModel().currentRowChanged.connect(self._show_detail)
+        self._detail_source.clear()
+        self._detail_result.clear()
+        self.update_label(0)
+
+    def set_results(self, results: list[str | None]):
+        self._results = results
+        if self._model is not None:
+            self._model.set_results(results)
+        self._show_detail(self._table.currentIndex())
+
+    def segment_translated(self, row: int):
+        if self._model is not None:
+            self._model.segment_changed(row)
+        if self._table.currentIndex().row() == row:
+            self._show_detail(self._table.currentIndex())
+
+    def update_label(self, done: int):
+        if self._document is None:
+            self._label.clear()
+            return
+        self._label.setText(
+            f"{self._document.path.name} · {self._document.size / 1024 / 1024:.1f} MB"
+            f" · 已翻译 {done}/{len(self._document)} 段"
+        )
+
+    def _show_detail(self, current: QModelIndex, previous: QModelIndex | None = None):
+        if self._document is None or not current.isValid():
+            return
+        row = current.row()
+        self._detail_source.setPlainText(self._document.text(row))
+        result = self._results[row] if row < len(self._results) else None
+        self._detail_result.setPlainText(result or "")
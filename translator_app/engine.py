@@ -0,0 +1,658 @@
+import asyncio
+import time
+import traceback
+from concurrent.futures import CancelledError, Future
+from typing import Callable
+
+from .cache import TranslationCache, make_cache_key
+from .config import Config, DEFAULT_SYSTEM_PROMPT
+from .event_loop import event_loop
+from .glossary import GlossaryEntry, glossary
+from .memory import MemoryMatch, TranslationMemory, sentence_pairs
+from .metrics import RequestMetrics, current_request, metrics_log
+from .router import Endpoint, configured_endpoints, router
+from .scheduler import is_retryable, scheduler
+from .segmenter import Segment, estimate_tokens, join_separator, split_segments, split_sentences
+from .single_flight import single_flight
+from .stream_assembler import StreamAssembler
+
+MAX_PARALLEL_SEGMENTS = 4
+REQUEST_TIMEOUT = 60.0
+
+# Follow-up requests made for one translation cut off by the model's output limit.
+MAX_CONTINUATIONS = 4
+CONTINUE_PROMPT = "上面的译文因长度限制被截断。请从截断处逐字接着输出，即使停在句子或单词中间也直接续写，不要重复或改写已输出的内容，只输出译文。"
+# Source tokens sent per request, as a share of a model's observed output limit.
+OUTPUT_LIMIT_SHARE = 0.6
+
+# Base URLs whose servers rejected stream_options, so usage is estimated instead.
+_NO_STREAM_OPTIONS: set[str] = set()
+# Completion tokens at which (base_url, model) has cut a response off.
+_OUTPUT_LIMITS: dict[tuple[str, str], int] = {}
+
+
+def output_budget(config: Config) -> int | None:
+    # Largest source text worth sending in one request, once truncation has been seen.
+    limit = _OUTPUT_LIMITS.get((config.base_url, config.model))
+    return max(int(limit * OUTPUT_LIMIT_SHARE), 1) if limit else None
+
+
+def build_system_prompt(config: Config, target_lang: str) -> str:
+    prompt_template = config.system_prompt or DEFAULT_SYSTEM_PROMPT
+    return prompt_template.format(
+        target_lang=target_lang,
+    )
+
+
+def describe_error(error: Exception) -> str:
+    from openai import APIConnectionError, APITimeoutError, APIStatusError
+
+    if isinstance(error, APITimeoutError):
+        return "请求超时，请稍后重试。"
+    if isinstance(error, APIConnectionError):
+        return "无法连接到 API 服务器，请检查网络或 Base URL 设置。"
+    if isinstance(error, APIStatusError):
+        return f"API 返回错误 ({error.status_code}): {error.message}"
+    traceback.print_exception(type(error), error, error.__traceback__)
+    return f"请求异常: {error}"
+
+
+def is_failover_error(error: BaseException) -> bool:
+    from openai import APIConnectionError, APIStatusError
+
+    # Connection problems, timeouts and server errors are worth another endpoint;
+    # client errors such as a bad key or prompt would fail there too.
+    if isinstance(error, APIConnectionError):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+def glossary_terms(config: Config, target_lang: str, text: str) -> list[GlossaryEntry]:
+    return glossary.lookup(target_lang, text) if config.use_glossary else []
+
+
+def memory_reusable(config: Config, target_lang: str, text: str) -> bool:
+    # The memory does not know which glossary a translation was made with, so
+    # text with glossary terms is translated again rather than reused as it is.
+    return not glossary_terms(config, target_lang, text)
+
+
+def _glossary_block(terms: list[GlossaryEntry]) -> str:
+    lines = "\n".join(f"{term.source} → {term.target}" for term in terms)
+    return f"请按以下术语表翻译文中出现的术语：\n{lines}"
+
+
+def cache_prompt(system_prompt: str, terms: list[GlossaryEntry]) -> str:
+    # Cached translations depend on the glossary entries they were made with.
+    return f"{system_prompt}\n\n{_glossary_block(terms)}" if terms else system_prompt
+
+
+def _with_hint(text: str, hint: MemoryMatch | None, terms: list[GlossaryEntry] | None = None) -> str:
+    if hint is None and not terms:
+        return text
+    parts = [_glossary_block(terms)] if terms else []
+    if hint is not None:
+        parts.append(
+            f"以下是一段相似原文及其已有译文，请在适用处保持术语和措辞一致，但只翻译待翻译文本：\n"
+            f"相似原文：{hint.source}\n已有译文：{hint.target}"
+        )
+    parts.append(f"待翻译文本：\n{text}")
+    return "\n\n".join(parts)
+
+
+def cached_tokens(usage) -> int | None:
+    # OpenAI-style usage details, or DeepSeek's prompt_cache_hit_tokens.
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    if cached is None:
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    return cached
+
+
+def build_user_content(
+    system_prompt: str,
+    text: str,
+    hint: MemoryMatch | None = None,
+    terms: list[GlossaryEntry] | None = None,
+) -> str:
+    return f"{system_prompt}\n\n{_with_hint(text, hint, terms)}"
+
+
+def build_messages(
+    system_prompt: str,
+    text: str,
+    hint: MemoryMatch | None = None,
+    system_message: bool = False,
+    terms: list[GlossaryEntry] | None = None,
+) -> list[dict]:
+    # Glossary entries found in the text go with the text rather than into the
+    # instructions, which stay the same for every request.
+    if not system_message:
+        return [{"role": "user", "content": build_user_content(system_prompt, text, hint, terms)}]
+    # The instructions come first and byte-identical in every request, so
+    # providers with automatic prefix caching only process the text itself.
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": _with_hint(text, hint, terms)},
+    ]
+
+
+def prompt_tokens(messages: list[dict]) -> int:
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+
+class TranslationJob:
+    def __init__(
+        self,
+        config: Config,
+        text: str,
+        target_lang: str,
+        cache: TranslationCache | None = None,
+        segments: list[Segment] | None = None,
+        on_text: Callable[[str], None] | None = None,
+        on_progress: Callable[[int, int], None] | None = None,
+        memory: TranslationMemory | None = None,
+        prefilled: list[str | None] | None = None,
+        system_prompt: str | None = None,
+        splittable: bool = True,
+    ):
+        self._config = config
+        self._system_prompt = system_prompt
+        # False for text that only makes sense whole, such as a framed JSON batch.
+        self._splittable = splittable
+        self._text = text
+        self._target_lang = target_lang
+        self._cache = cache
+        self._memory = memory
+        self._segments = segments or [Segment(text)]
+        self._results: list[str | None] = list(prefilled or [None] * len(self._segments))
+        self._on_text = on_text or (lambda text: None)
+        self._on_progress = on_progress or (lambda done, total: None)
+        self._cancelled = False
+        self._future: Future | None = None
+        self._head = 0
+        self._pending: list[list[str]] = []
+        self._done: list[bool] = []
+        self._completed = 0
+        self.memory_exact = 0
+        self.memory_fuzzy = 0
+        # Sentences reused from the memory inside segments that still needed translating.
+        self.memory_sentences = 0
+        # Per segment: (sentence, separator, translation or None) when only some sentences are known.
+        self._plans: dict[int, list[tuple[str, str, str | None]]] = {}
+        self.reused = sum(result is not None for result in self._results)
+        self.requests: list[RequestMetrics] = []
+        # Requests of this job that joined an identical one already in flight.
+        self.coalesced = 0
+        self.hedged = 0
+        self.failovers = 0
+        self.continuations = 0
+        self.glossary_terms = 0
+
+    @property
+    def results(self) -> list[str | None]:
+        return self._results
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._segments)
+
+    @property
+    def retries(self) -> int:
+        return sum(request.attempt > 0 for request in self.requests)
+
+    def start(self) -> Future:
+        self._future = event_loop.submit(self.run_async())
+        return self._future
+
+    def cancel(self):
+        self._cancelled = True
+        if self._future is not None:
+            self._future.cancel()
+
+    def run(self) -> str | None:
+        try:
+            return self.start().result()
+        except CancelledError:
+            return None
+        except BaseException:
+            self.cancel()
+            raise
+
+    async def run_async(self) -> str | None:
+        system_prompt = self._system_prompt or build_system_prompt(self._config, self._target_lang)
+        cache_key = make_cache_key(
+            self._config.model,
+            self._config.base_url,
+            cache_prompt(system_prompt, glossary_terms(self._config, self._target_lang, self._text)),
+            self._target_lang,
+            self._text,
+        )
+        if self._cache is not None:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                if len(self._segments) == 1:
+                    self._results[0] = cached
+                self._on_text(cached)
+                return cached
+
+        results = self._results
+        hints: list[MemoryMatch | None] = [None] * len(self._segments)
+        if self._memory is not None:
+            for i, segment in enumerate(self._segments):
+                if results[i] is None:
+                    results[i], hints[i] = self._recall(i, segment.source)
+        todo = [i for i, result in enumerate(results) if result is None]
+
+        if not todo:
+            result = self._replay(results)
+        elif len(self._segments) == 1:
+            results[0] = await self._translate_source(system_prompt, 0, self._text, self._on_text, hints[0])
+            result = results[0]
+        else:
+            result = await self._translate_segments(system_prompt, results, hints)
+
+        if self._cancelled:
+            return None
+        if self._memory is not None and todo:
+            self._memory.add_many(
+                self._target_lang,
+                [pair for i in todo for pair in sentence_pairs(self._segments[i].source, results[i])],
+            )
+        if self._cache is not None and result:
+            self._cache.put(cache_key, result)
+        return result
+
+    def _recall(self, index: int, source: str) -> tuple[str | None, MemoryMatch | None]:
+        # The whole segment, else sentence by sentence; a segment with only some
+        # sentences known gets a plan so just the others are sent.
+        match = self._memory.lookup(self._target_lang, source)
+        reusable = memory_reusable(self._config, self._target_lang, source)
+        if match is not None and match.exact and reusable:
+            self.memory_exact += 1
+            return match.target, None
+        sentences = split_sentences(source)
+        if len(sentences) > 1:
+            known = [
+                (
+                    self._memory.lookup(self._target_lang, sentence, fuzzy=False)
+                    if reusable or memory_reusable(self._config, self._target_lang, sentence) else None
+                ) if sentence.strip() else MemoryMatch("", "", 1.0)
+                for sentence, _ in sentences
+            ]
+            if all(known):
+                self.memory_exact += 1
+                return "".join(k.target + join_separator(k.target, separator) for k, (_, separator) in zip(known, sentences)), None
+            if any(k is not None and k.source for k in known):
+                self.memory_sentences += sum(k is not None and bool(k.source) for k in known)
+                self._plans[index] = [
+                    (sentence, separator, None if k is None else k.target)
+                    for k, (sentence, separator) in zip(known, sentences)
+                ]
+                return None, None
+        if match is not None:
+            self.memory_fuzzy += 1
+        return None, match
+
+    async def _translate_source(
+        self,
+        system_prompt: str,
+        index: int,
+        text: str,
+        on_text,
+        hint: MemoryMatch | None,
+    ) -> str:
+        plan = self._plans.get(index)
+        if plan is None:
+            return await self._stream_text(system_prompt, text, on_text, hint)
+        # Known sentences are replayed in place; each run of the others is translated on its own.
+        out = []
+        pending: list[tuple[str, str]] = []
+        for sentence, separator, known in plan + [("", "", "")]:
+            if known is None:
+                pending.append((sentence, separator))
+                continue
+            if pending:
+                run = "".join(s + sep for s, sep in pending[:-1]) + pending[-1][0]
+                match = self._memory.lookup(self._target_lang, run)
+                if match is not None and match.exact and memory_reusable(self._config, self._target_lang, run):
+                    out.append(match.target)
+                    on_text(match.target)
+                else:
+                    out.append(await self._stream_text(system_prompt, run, on_text, match))
+                separator_after = join_separator(out[-1], pending[-1][1])
+                out.append(separator_after)
+                on_text(separator_after)
+                pending = []
+            if known or separator:
+                # The source's spacing, unless the translation is written without spaces.
+                piece = known + join_separator(known or (out[-1] if out else ""), separator)
+                out.append(piece)
+                on_text(piece)
+        return "".join(out)
+
+    async def _stream_text(
+        self,
+        system_prompt: str,
+        text: str,
+        on_text,
+        hint: MemoryMatch | None = None,
+    ) -> str:
+        budget = output_budget(self._config)
+        if self._splittable and budget is not None and estimate_tokens(text) > budget:
+            parts = split_segments(text, budget)
+            if len(parts) > 1:
+                # The model cannot write this much in one go; translate it piece by piece.
+                results = []
+                for part in parts:
+                    results.append(await self._stream_text(system_prompt, part.source, on_text))
+                    results.append(part.separator)
+                    on_text(part.separator)
+                return "".join(results)
+
+        terms = glossary_terms(self._config, self._target_lang, text)
+        self.glossary_terms += len(terms)
+        messages = build_messages(system_prompt, text, hint, self._config.system_message, terms)
+        # Identical requests already streaming are joined instead of re-sent.
+        key = (
+            self._config.base_url,
+            self._config.model,
+            tuple((message["role"], message["content"]) for message in messages),
+        )
+        text, joined = await single_flight.run(
+            key,
+            lambda emit, requests: self._request_complete(messages, emit, requests),
+            on_text,
+            self.requests,
+        )
+        self.coalesced += joined
+        return text
+
+    async def _request_complete(self, messages: list[dict], on_text, requests: list[RequestMetrics]) -> str:
+        text, metrics, endpoint = await self._request_routed(messages, on_text, requests)
+        for _ in range(MAX_CONTINUATIONS):
+            if metrics.finish_reason != "length" or not text:
+                break
+            self.continuations += 1
+            if metrics.completion_tokens:
+                # The endpoint that was cut off, which after a failover or hedge is not the primary.
+                key = (endpoint.base_url, endpoint.model)
+                _OUTPUT_LIMITS[key] = min(_OUTPUT_LIMITS.get(key, metrics.completion_tokens), metrics.completion_tokens)
+            # Everything streamed so far stays as it is; the model picks up exactly
+            # where it stopped, mid-sentence or mid-word, so nothing is written twice.
+            follow_up = messages + [
+                {"role": "assistant", "content": text},
+                {"role": "user", "content": CONTINUE_PROMPT},
+            ]
+            more, metrics, endpoint = await self._request_routed(follow_up, on_text, requests)
+            text += more
+        return text
+
+    async def _request_routed(
+        self,
+        messages: list[dict],
+        on_text,
+        requests: list[RequestMetrics],
+    ) -> tuple[str, RequestMetrics, Endpoint]:
+        candidates = router.rank(configured_endpoints(self._config))
+        hedge = self._config.hedge_requests
+        running: dict[asyncio.Future, tuple[Endpoint, float]] = {}
+        winner: asyncio.Future | None = None
+        error: BaseException | None = None
+
+        def start(endpoint: Endpoint):
+            def emit(text: str):
+                nonlocal winner
+                if winner is None:
+                    # First token wins; the other attempt is dropped.
+                    winner = task
+                    for other, (slow, started) in running.items():
+                        if other is not task:
+                            other.cancel()
+                            router.record_ttft(slow, time.perf_counter() - started)
+                if winner is task:
+                    on_text(text)
+
+            # With nowhere left to fail over to, server errors are retried in place.
+            task = asyncio.ensure_future(self._request_stream(endpoint, messages, emit, not candidates, requests))
+            running[task] = (endpoint, time.perf_counter())
+
+        start(candidates.pop(0))
+        try:
+            while running:
+                timeout = None
+                if hedge and winner is None and candidates and len(running) == 1:
+                    timeout = router.hedge_delay(next(iter(running.values()))[0])
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if winner is None:
+                        self.hedged += 1
+                        hedge = False
+                        start(candidates.pop(0))
+                    continue
+                for task in done:
+                    endpoint, _ = running.pop(task)
+                    if task.cancelled():
+                        continue
+                    if task.exception() is None:
+                        router.record_success(endpoint)
+                        if winner is None or winner is task:
+                            return *task.result(), endpoint
+                        continue
+                    error = task.exception()
+                    if not is_failover_error(error):
+                        if winner is task or not running:
+                            raise error
+                        continue
+                    router.record_failure(endpoint)
+                    if winner is task:
+                        # Text already reached the listener; retrying elsewhere would duplicate it.
+                        raise error
+                if not running and candidates:
+                    self.failovers += 1
+                    start(candidates.pop(0))
+            raise error
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def _create_stream(self, client, endpoint: Endpoint, messages: list[dict]):
+        from openai import BadRequestError
+
+        kwargs = {
+            "model": endpoint.model,
+            "stream": True,
+            "messages": messages,
+        }
+        if endpoint.base_url not in _NO_STREAM_OPTIONS:
+            try:
+                return await client.chat.completions.create(
+                    **kwargs, stream_options={"include_usage": True}
+                )
+            except BadRequestError as e:
+                # Some OpenAI-compatible servers reject stream_options.
+                if "stream_options" not in str(e):
+                    raise
+                _NO_STREAM_OPTIONS.add(endpoint.base_url)
+        return await client.chat.completions.create(**kwargs)
+
+    async def _request_stream(
+        self,
+        endpoint: Endpoint,
+        messages: list[dict],
+        on_text,
+        retry_failures: bool,
+        requests: list[RequestMetrics],
+    ) -> tuple[str, RequestMetrics]:
+        emitted = False
+        attempts = 0
+
+        def emit(text: str):
+            nonlocal emitted
+            emitted = True
+            on_text(text)
+
+        def retryable(error: BaseException) -> bool:
+            # Once text has reached the listener a retry would repeat it.
+            if emitted:
+                return False
+            return is_retryable(error) or (retry_failures and is_failover_error(error))
+
+        def attempt(queued: float):
+            nonlocal attempts
+            attempts += 1
+            return self._request_once(endpoint, messages, emit, queued, requests, attempts - 1)
+
+        # Budget for the prompt plus a translation of about the same length.
+        cost = prompt_tokens(messages) * 2
+        return await scheduler.run(
+            endpoint,
+            cost,
+            attempt,
+            retryable,
+        )
+
+    async def _request_once(
+        self,
+        endpoint: Endpoint,
+        messages: list[dict],
+        on_text,
+        queued: float,
+        requests: list[RequestMetrics],
+        attempt: int,
+    ) -> tuple[str, RequestMetrics]:
+        from .clients import client_manager
+
+        async with client_manager.lease(endpoint.base_url, endpoint.api_key, REQUEST_TIMEOUT) as client:
+            metrics = RequestMetrics(endpoint.model, endpoint.base_url)
+            metrics.queue_ms = queued * 1000
+            metrics.attempt = attempt
+            # Collected per flight; every job sharing the flight gets them.
+            requests.append(metrics)
+            token = current_request.set(metrics)
+            assembler = StreamAssembler()
+            status = "error"
+            try:
+                stream = await self._create_stream(client, endpoint, messages)
+
+                # Leaving the block (including on cancellation) closes the HTTP response.
+                async with stream:
+                    async for chunk in stream:
+                        if chunk.usage is not None:
+                            metrics.prompt_tokens = chunk.usage.prompt_tokens
+                            metrics.completion_tokens = chunk.usage.completion_tokens
+                            metrics.cached_tokens = cached_tokens(chunk.usage)
+
+                        if not chunk.choices:
+                            continue
+
+                        choice = chunk.choices[0]
+                        if choice.finish_reason is not None:
+                            metrics.finish_reason = choice.finish_reason
+
+                        delta_content = choice.delta.content if choice.delta else None
+                        if delta_content:
+                            new_text = assembler.feed(delta_content)
+                            if new_text:
+                                metrics.on_chunk(new_text)
+                                on_text(new_text)
+                status = "ok"
+                return assembler.text(), metrics
+            except asyncio.CancelledError:
+                status = "cancelled"
+                raise
+            finally:
+                current_request.reset(token)
+                if metrics.completion_tokens is None and metrics.chars:
+                    metrics.completion_tokens = estimate_tokens(assembler.text())
+                    metrics.tokens_estimated = True
+                metrics.finish(status)
+                metrics_log.append(metrics)
+                if status == "ok" and metrics.ttft_ms is not None:
+                    router.record_ttft(endpoint, metrics.ttft_ms / 1000)
+
+    def _replay(self, results: list[str]) -> str:
+        result = "".join(
+            text + segment.separator for text, segment in zip(results, self._segments)
+        )
+        if len(results) > 1:
+            self._on_progress(len(results), len(results))
+        self._on_text(result)
+        return result
+
+    def _advance(self):
+        # Emit everything that is now contiguous from the head segment onwards.
+        out = []
+        while self._head < len(self._segments):
+            out.extend(self._pending[self._head])
+            self._pending[self._head].clear()
+            if not self._done[self._head]:
+                break
+            self._head += 1
+            if self._head < len(self._segments):
+                out.append(self._segments[self._head - 1].separator)
+        text = "".join(out)
+        if text:
+            self._on_text(text)
+
+    def _on_segment_text(self, index: int, text: str):
+        if index == self._head:
+            self._on_text(text)
+        else:
+            self._pending[index].append(text)
+
+    async def _translate_segment(
+        self,
+        system_prompt: str,
+        index: int,
+        hint: MemoryMatch | None,
+        limit: asyncio.Semaphore,
+    ) -> str:
+        async with limit:
+            result = await self._translate_source(
+                system_prompt,
+                index,
+                self._segments[index].source,
+                lambda text: self._on_segment_text(index, text),
+                hint,
+            )
+        self._done[index] = True
+        self._completed += 1
+        self._advance()
+        self._on_progress(self._completed, len(self._segments))
+        return result
+
+    async def _translate_segments(
+        self,
+        system_prompt: str,
+        results: list[str | None],
+        hints: list[MemoryMatch | None],
+    ) -> str:
+        self._pending = [[] if result is None else [result] for result in results]
+        self._done = [result is not None for result in results]
+        self._completed = sum(self._done)
+        self._advance()
+        self._on_progress(self._completed, len(self._segments))
+
+        limit = asyncio.Semaphore(MAX_PARALLEL_SEGMENTS)
+        todo = [i for i, result in enumerate(results) if result is None]
+        tasks = [
+            asyncio.ensure_future(self._translate_segment(system_prompt, i, hints[i], limit))
+            for i in todo
+        ]
+        try:
+            for i, translated in zip(todo, await asyncio.gather(*tasks)):
+                results[i] = translated
+        except BaseException:
+            # One failed or cancelled segment stops the rest of the document.
+            for task in tasks:
+                task.cancel()
+            raise
+        return "".join(
+            result + segment.separator
+            for result, segment in zip(results, self._segments)
+        )
@@ -0,0 +1,450 @@
+import asyncio
+import json
+import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import CancelledError, Future
+from pathlib import Path
+from typing import Callable, Iterator, TextIO
+
+from .batch import BATCH_TOKENS, MAX_BATCH_STRINGS, BatchTranslation
+from .cache import TranslationCache
+from .config import Config
+from .engine import MAX_PARALLEL_SEGMENTS
+from .event_loop import event_loop
+from .memory import TranslationMemory
+from .metrics import RequestMetrics
+from .segmenter import estimate_tokens
+
+# Text nodes are translated a window at a time and written out in order, so
+# only the windows in flight are ever held in memory.
+WINDOW_TOKENS = BATCH_TOKENS * MAX_PARALLEL_SEGMENTS
+WINDOW_STRINGS = MAX_BATCH_STRINGS * MAX_PARALLEL_SEGMENTS
+WINDOWS_IN_FLIGHT = 2
+READ_CHARS = 64 * 1024
+
+
+class Text:
+    # A translatable node: `original` is written back unchanged when there is
+    # no translation, `render` turns a translation into the file's syntax.
+    __slots__ = ("source", "original", "render")
+
+    def __init__(self, source: str, original: str, render: Callable[[str], str]):
+        self.source = source
+        self.original = original
+        self.render = render
+
+
+def _split_eol(line: str) -> tuple[str, str]:
+    body = line.rstrip("\r\n")
+    return body, line[len(body):]
+
+
+def _lines(lines: list[str]) -> Text:
+    # Lines of running text, translated as one node; line breaks follow the file's style.
+    eol = _split_eol(lines[0])[1] or "\n"
+    original = "".join(lines)
+    body, ending = _split_eol(original)
+    return Text(body.replace(eol, "\n"), original, lambda text: text.replace("\n", eol) + ending)
+
+
+def _srt_block(lines: list[str]) -> Iterator[str | Text]:
+    timing = next((i for i, line in enumerate(lines[:3]) if "-->" in line), None)
+    if timing is None:
+        yield "".join(lines)
+        return
+    yield "".join(lines[:timing + 1])
+    if len(lines) > timing + 1:
+        yield _lines(lines[timing + 1:])
+
+
+def parse_srt(f: TextIO) -> Iterator[str | Text]:
+    block: list[str] = []
+    for line in f:
+        if line.strip():
+            block.append(line)
+            continue
+        yield from _srt_block(block)
+        block = []
+        yield line
+    yield from _srt_block(block)
+
+
+_PO_KEYWORD = re.compile(r"(msgctxt|msgid_plural|msgid|msgstr(?:\[\d+\])?)\s+(\".*)")
+_PO_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", '"': '"', "\\": "\\"}
+_PO_ESCAPE = re.compile(r"\\(.)")
+_PO_QUOTE = str.maketrans({"\\": "\\\\", '"': '\\"', "\t": "\\t", "\r": "\\r", "\n": "\\n"})
+
+
+def _po_unquote(lines: list[str]) -> str:
+    parts = []
+    for line in lines:
+        line = line.strip()
+        if line.startswith('"') and line.endswith('"') and len(line) >= 2:
+            parts.append(_PO_ESCAPE.sub(lambda m: _PO_ESCAPES.get(m.group(1), m.group(1)), line[1:-1]))
+    return "".join(parts)
+
+
+def _po_quote(text: str) -> str:
+    return '"' + text.translate(_PO_QUOTE) + '"'
+
+
+def _po_value(lines: list[str]) -> str:
+    # The keyword line of a field plus its continuation lines.
+    return _po_unquote([lines[0].split(None, 1)[1]] + lines[1:])
+
+
+def _po_field(keyword: str, text: str, multiline: bool, eol: str) -> str:
+    # Multi-line strings are laid out like the msgid they translate.
+    if not multiline or "\n" not in text.rstrip("\n"):
+        return f"{keyword} {_po_quote(text)}{eol}"
+    pieces = [piece for piece in re.split(r"(?<=\n)", text) if piece]
+    return f'{keyword} ""{eol}' + "".join(_po_quote(piece) + eol for piece in pieces)
+
+
+def _po_entry(lines: list[str]) -> Iterator[str | Text]:
+    # Only untranslated entries are touched; existing translations, the header
+    # and obsolete entries are copied as they are.
+    fields: list[tuple[str, int, int]] = []
+    for i, line in enumerate(lines):
+        match = _PO_KEYWORD.match(line)
+        if match:
+            fields.append((match.group(1), i, i + 1))
+        elif fields and line.lstrip().startswith('"'):
+            keyword, start, _ = fields[-1]
+            fields[-1] = (keyword, start, i + 1)
+    values = {keyword: lines[start:end] for keyword, start, end in fields}
+    strings = [(keyword, start, end) for keyword, start, end in fields if keyword.startswith("msgstr")]
+    msgid = _po_value(values["msgid"]) if "msgid" in values else ""
+    translated = any(_po_value(lines[start:end]) for _, start, end in strings)
+    if not msgid or not strings or translated or any(line.startswith("#~") for line in lines):
+        yield "".join(lines)
+        return
+
+    first, last = strings[0][1], strings[-1][2]
+    eol = _split_eol(lines[first])[1] or "\n"
+    multiline = len(values["msgid"]) > 1
+    yield "".join(lines[:first])
+    original = "".join(lines[first:last])
+    if "msgid_plural" not in values:
+        yield Text(msgid, original, lambda text: _po_field("msgstr", text, multiline, eol))
+    else:
+        plural = _po_value(values["msgid_plural"])
+        forms = [keyword for keyword, _, _ in strings]
+        # Form 0 is the singular; every other form gets the plural's translation.
+        yield Text(msgid, "".join(lines[strings[0][1]:strings[0][2]]),
+                   lambda text: _po_field(forms[0], text, multiline, eol))
+        yield Text(plural, "".join(lines[strings[1][1]:last]) if len(strings) > 1 else "",
+                   lambda text: "".join(_po_field(form, text, multiline, eol) for form in forms[1:]))
+    yield "".join(lines[last:])
+
+
+def parse_po(f: TextIO) -> Iterator[str | Text]:
+    entry: list[str] = []
+    for line in f:
+        if line.strip():
+            entry.append(line)
+            continue
+        yield from _po_entry(entry)
+        entry = []
+        yield line
+    yield from _po_entry(entry)
+
+
+_JSON_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.S)
+_SIGNIFICANT = re.compile(r"\S")
+
+
+def parse_json(f: TextIO) -> Iterator[str | Text]:
+    # Scans the text instead of loading it, so formatting, key order and
+    # number spelling come back exactly as they were. Keys are left alone.
+    buffer, pos, eof = "", 0, False
+    while True:
+        start = buffer.find('"', pos)
+        if start < 0:
+            yield buffer[pos:]
+            if eof:
+                return
+            buffer, pos = f.read(READ_CHARS), 0
+            eof = not buffer
+            continue
+        match = _JSON_STRING.match(buffer, start)
+        follow = _SIGNIFICANT.search(buffer, match.end()) if match else None
+        if follow is None and not eof:
+            # A string is only classified once the character after it has been read.
+            chunk = f.read(READ_CHARS)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield buffer[pos:start]
+        if match is None:
+            yield buffer[start:]
+            return
+        token = match.group()
+        if follow is not None and follow.group() == ":":
+            yield token
+        else:
+            yield Text(json.loads(token), token, lambda text: json.dumps(text, ensure_ascii=False))
+        pos = match.end()
+
+
+_FENCE = re.compile(r"^\s{0,3}(```|~~~)")
+_HEADING = re.compile(r"^(\s{0,3}#{1,6}[ \t]+)(.*?)([ \t]+#+)?([ \t]*)$")
+_RULE = re.compile(r"^\s{0,3}([-*_])(\s*\1){2,}\s*$")
+_ITEM = re.compile(r"^(\s*(?:>\s*)*(?:[-*+]|\d+[.)])[ \t]+(?:\[[ xX]\][ \t]+)?|\s*(?:>\s*)+)")
+_TABLE_CELL = re.compile(r"(?<!\\)\|")
+_TABLE_RULE = re.compile(r"^[\s|:-]+$")
+
+
+def _table_row(line: str) -> Iterator[str | Text]:
+    body, eol = _split_eol(line)
+    if _TABLE_RULE.match(body):
+        yield line
+        return
+    cells = _TABLE_CELL.split(body)
+    for i, cell in enumerate(cells):
+        if i:
+            yield "|"
+        text = cell.strip()
+        if not text:
+            yield cell
+            continue
+        lead = cell[:len(cell) - len(cell.lstrip())]
+        trail = cell[len(cell.rstrip()):]
+        yield lead
+        yield Text(text, text, lambda translated: translated.replace("\n", " "))
+        yield trail
+    yield eol
+
+
+def _indent(text: str) -> int:
+    expanded = text.expandtabs(4)
+    return len(expanded) - len(expanded.lstrip())
+
+
+def parse_markdown(f: TextIO) -> Iterator[str | Text]:
+    paragraph: list[str] = []
+    fence: str | None = None
+    front_matter = False
+    # Content columns of the open list items; lines indented to one still belong to it.
+    lists: list[int] = []
+    for number, line in enumerate(f):
+        body, eol = _split_eol(line)
+        if number == 0 and body == "---":
+            front_matter = True
+            yield line
+            continue
+        if front_matter:
+            front_matter = body not in ("---", "...")
+            yield line
+            continue
+        if fence is not None:
+            if body.strip().startswith(fence):
+                fence = None
+            yield line
+            continue
+
+        match = _FENCE.match(body)
+        heading = _HEADING.match(body)
+        blank = not body.strip()
+        item = _ITEM.match(body)
+        indent = _indent(body)
+        while lists and not blank and not item and indent < lists[-1]:
+            lists.pop()
+        # Indented code only starts after a blank line, never inside a paragraph,
+        # and inside a list only four columns past the item's content.
+        code = not paragraph and not blank and indent >= (lists[-1] if lists else 0) + 4
+        if code:
+            item = None
+        nested = not paragraph and not blank and not code and not item and bool(lists)
+        if paragraph and (match or blank or code or item or heading or _RULE.match(body)
+                          or body.lstrip().startswith("|") or body.lstrip().startswith("<")):
+            yield _lines(paragraph)
+            paragraph = []
+
+        if match:
+            fence = match.group(1)
+            yield line
+        elif blank or code or _RULE.match(body):
+            yield line
+        elif heading:
+            yield heading.group(1)
+            if heading.group(2):
+                yield Text(heading.group(2), heading.group(2), lambda text: text.replace("\n", " "))
+            yield (heading.group(3) or "") + heading.group(4) + eol
+        elif body.lstrip().startswith("|"):
+            yield from _table_row(line)
+        elif body.lstrip().startswith("<"):
+            # HTML blocks and comments are copied; their text is rarely worth the risk.
+            yield line
+        elif item:
+            if item.group(1).strip().strip(">").strip():
+                column = len(item.group(1).expandtabs(4))
+                while lists and lists[-1] >= column:
+                    lists.pop()
+                lists.append(column)
+            yield item.group(1)
+            rest = line[item.end():]
+            if rest.strip():
+                paragraph.append(rest)
+            else:
+                yield rest
+        elif nested:
+            # A paragraph continuing a list item after a blank line.
+            yield body[:len(body) - len(body.lstrip())]
+            paragraph.append(line.lstrip())
+        else:
+            paragraph.append(line)
+    if paragraph:
+        yield _lines(paragraph)
+
+
+PARSERS: dict[str, Callable[[TextIO], Iterator[str | Text]]] = {
+    ".srt": parse_srt,
+    ".po": parse_po,
+    ".pot": parse_po,
+    ".json": parse_json,
+    ".md": parse_markdown,
+    ".markdown": parse_markdown,
+}
+
+
+def is_structured(path: str | os.PathLike) -> bool:
+    return Path(path).suffix.lower() in PARSERS
+
+
+def _translatable(text: str) -> bool:
+    # Numbers, symbols and blank values are copied as they are.
+    return any(char.isalpha() for char in text)
+
+
+class FileTranslation:
+    def __init__(
+        self,
+        config: Config,
+        source: str | os.PathLike,
+        output: str | os.PathLike | TextIO,
+        target_lang: str,
+        cache: TranslationCache | None = None,
+        memory: TranslationMemory | None = None,
+        on_progress: Callable[[int, int], None] | None = None,
+    ):
+        self._config = config
+        self.source = Path(source)
+        # A path is written through a temporary file; "-" means stdout.
+        self._output = output
+        self._target_lang = target_lang
+        self._cache = cache
+        self._memory = memory
+        self.on_progress = on_progress or (lambda done, total: None)
+        self._parser = PARSERS[self.source.suffix.lower()]
+        self._cancelled = False
+        self._future: Future | None = None
+        self.found = 0
+        self.written = 0
+        self.untranslated = 0
+        self.reused = 0
+        self.batches = 0
+        self.requests: list[RequestMetrics] = []
+        self._limit: asyncio.Semaphore | None = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def start(self) -> Future:
+        self._future = event_loop.submit(self.run_async())
+        return self._future
+
+    def cancel(self):
+        self._cancelled = True
+        if self._future is not None:
+            self._future.cancel()
+
+    def run(self):
+        try:
+            self.start().result()
+        except CancelledError:
+            pass
+        except BaseException:
+            self.cancel()
+            raise
+
+    async def run_async(self):
+        if self._output == "-":
+            await self._translate(sys.stdout)
+            return
+        if not isinstance(self._output, (str, os.PathLike)):
+            await self._translate(self._output)
+            return
+        path = Path(self._output)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8", newline="") as out:
+                await self._translate(out)
+            os.replace(tmp, path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    async def _translate(self, out: TextIO):
+        # One limit across all windows in flight, so the file never has more than
+        # MAX_PARALLEL_SEGMENTS requests open at once.
+        self._limit = asyncio.Semaphore(MAX_PARALLEL_SEGMENTS)
+        windows: deque[tuple[list, list[int], BatchTranslation, asyncio.Future]] = deque()
+        items: list[str | Text] = []
+        indices: list[int] = []
+        strings: list[str] = []
+        tokens = 0
+        try:
+            # newline="" keeps \r\n line endings intact.
+            with open(self.source, encoding="utf-8", newline="") as f:
+                for item in self._parser(f):
+                    if isinstance(item, Text) and _translatable(item.source):
+                        indices.append(len(items))
+                        strings.append(item.source)
+                        tokens += estimate_tokens(item.source)
+                        self.found += 1
+                    items.append(item)
+                    if len(strings) >= WINDOW_STRINGS or tokens >= WINDOW_TOKENS:
+                        windows.append(self._submit(items, indices, strings))
+                        items, indices, strings, tokens = [], [], [], 0
+                        if len(windows) >= WINDOWS_IN_FLIGHT:
+                            await self._write(out, *windows.popleft())
+            windows.append(self._submit(items, indices, strings))
+            while windows:
+                await self._write(out, *windows.popleft())
+        except BaseException:
+            for _, _, _, task in windows:
+                task.cancel()
+            raise
+
+    def _submit(self, items: list, indices: list[int], strings: list[str]):
+        batch = BatchTranslation(
+            self._config, strings, self._target_lang, self._cache, self._memory, limit=self._limit
+        )
+        return items, indices, batch, asyncio.ensure_future(batch.run_async())
+
+    async def _write(self, out: TextIO, items: list, indices: list[int], batch: BatchTranslation, task):
+        try:
+            results = await task
+        finally:
+            self.requests.extend(batch.requests)
+        self.reused += batch.reused
+        self.batches += batch.batches
+        translations = dict(zip(indices, results))
+        for i, item in enumerate(items):
+            if isinstance(item, str):
+                out.write(item)
+                continue
+            translated = translations.get(i)
+            if translated is None:
+                if i in translations:
+                    self.untranslated += 1
+                out.write(item.original)
+            else:
+                out.write(item.render(translated))
+        out.flush()
+        self.written += len(indices)
+        self.on_progress(self.written, self.found)
@@ -0,0 +1,441 @@
+"""Terminology glossary. Usage: python -m translator_app.glossary [--import FILE] [--list] [--clear] [--match TEXT]"""
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+import traceback
+from array import array
+from collections import deque
+from pathlib import Path
+
+from .config import CONFIG_DIR
+
+GLOSSARY_FILE = CONFIG_DIR / "glossary.sqlite3"
+AUTOMATON_FILE = CONFIG_DIR / "glossary.automaton"
+AUTOMATON_FORMAT = 1
+
+# Terms injected into one request at most, in order of first appearance.
+MAX_TERMS = 40
+# Edge keys pack (node, character) into one int: node * CHARS + code point.
+CHARS = 0x110000
+# Glossary files may have a header row starting with one of these.
+_HEADERS = {"source", "term", "原文", "术语"}
+
+
+def _fold(text: str) -> str:
+    # Case-insensitive matching that keeps every character at its position.
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+
+
+def _is_word(ch: str) -> bool:
+    # Scripts written with spaces between words; a term inside a longer word there
+    # ("cat" in "category") is not a match. CJK text has no such boundaries.
+    return ch.isalnum() and ord(ch) < 0x2E80
+
+
+class GlossaryEntry:
+    def __init__(self, source: str, target: str):
+        self.source = source
+        self.target = target
+
+
+class Automaton:
+    # Aho-Corasick over the folded sources: one pass over the text finds every
+    # occurrence of every term, however many terms there are.
+    def __init__(
+        self,
+        revision: str,
+        goto: dict[int, int],
+        fail: array,
+        out: array,
+        link: array,
+        sources: list[str],
+        targets: list[dict[str, str]],
+    ):
+        self.revision = revision
+        self._goto = goto
+        self._fail = fail
+        # Term ending at each node, or -1.
+        self._out = out
+        # Nearest node on the failure chain where a term ends, or 0.
+        self._link = link
+        self._sources = sources
+        self._targets = targets
+        self._lengths = [len(source) for source in sources]
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    @classmethod
+    def build(cls, revision: str, rows: list[tuple[str, str, str]]) -> "Automaton":
+        terms: dict[str, int] = {}
+        sources: list[str] = []
+        targets: list[dict[str, str]] = []
+        for source, target_lang, target in rows:
+            key = _fold(source)
+            if key not in terms:
+                terms[key] = len(sources)
+                sources.append(key)
+                targets.append({})
+            targets[terms[key]][target_lang] = target
+
+        goto: dict[int, int] = {}
+        children: list[list[tuple[int, int]]] = [[]]
+        out = array("i", [-1])
+        for index, key in enumerate(sources):
+            node = 0
+            for ch in key:
+                edge = node * CHARS + ord(ch)
+                child = goto.get(edge)
+                if child is None:
+                    child = len(children)
+                    goto[edge] = child
+                    children.append([])
+                    children[node].append((ord(ch), child))
+                    out.append(-1)
+                node = child
+            out[node] = index
+
+        fail = array("i", [0]) * len(children)
+        link = array("i", [0]) * len(children)
+        queue = deque(child for _, child in children[0])
+        while queue:
+            node = queue.popleft()
+            for code, child in children[node]:
+                state = fail[node]
+                while state and state * CHARS + code not in goto:
+                    state = fail[state]
+                target = goto.get(state * CHARS + code, 0)
+                fail[child] = target if target != child else 0
+                link[child] = fail[child] if out[fail[child]] >= 0 else link[fail[child]]
+                queue.append(child)
+        return cls(revision, goto, fail, out, link, sources, targets)
+
+    def matches(self, text: str) -> list[tuple[int, int, int]]:
+        # (start, end, term) of every whole-word occurrence, leftmost-longest first.
+        folded = _fold(text)
+        goto, fail, out, link, lengths = self._goto, self._fail, self._out, self._link, self._lengths
+        found = []
+        node = 0
+        for end, ch in enumerate(folded, 1):
+            code = ord(ch)
+            while True:
+                state = goto.get(node * CHARS + code)
+                if state is not None:
+                    node = state
+                    break
+                if not node:
+                    break
+                node = fail[node]
+            hit = node if out[node] >= 0 else link[node]
+            while hit:
+                term = out[hit]
+                start = end - lengths[term]
+                if not (
+                    (start and _is_word(folded[start - 1]) and _is_word(folded[start]))
+                    or (end < len(folded) and _is_word(folded[end]) and _is_word(folded[end - 1]))
+                ):
+                    found.append((start, end, term))
+                hit = link[hit]
+        found.sort(key=lambda match: (match[0], match[0] - match[1]))
+        return found
+
+    def lookup(self, target_lang: str, text: str, limit: int = MAX_TERMS) -> list[GlossaryEntry]:
+        entries = []
+        seen = set()
+        covered = 0
+        for start, end, term in self.matches(text):
+            targets = self._targets[term]
+            target = targets.get(target_lang, targets.get(""))
+            # Nested and overlapping terms give way to the longest one.
+            if target is None or start < covered:
+                continue
+            covered = end
+            if term in seen:
+                continue
+            seen.add(term)
+            entries.append(GlossaryEntry(text[start:end], target))
+            if len(entries) >= limit:
+                break
+        return entries
+
+    def save(self, path: Path):
+        header = {
+            "format": AUTOMATON_FORMAT,
+            "byteorder": sys.byteorder,
+            "revision": self.revision,
+            "edges": len(self._goto),
+            "nodes": len(self._fail),
+        }
+        edges = array("q", self._goto.keys())
+        states = array("i", self._goto.values())
+        strings = json.dumps([self._sources, self._targets], ensure_ascii=False).encode("utf-8")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(json.dumps(header).encode("ascii") + b"\n")
+                for data in (edges, states, self._fail, self._out, self._link):
+                    data.tofile(f)
+                f.write(strings)
+            os.replace(tmp, path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    @classmethod
+    def load(cls, path: Path, revision: str) -> "Automaton | None":
+        # None when the file is missing or was compiled from another revision.
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        newline = data.find(b"\n")
+        try:
+            header = json.loads(data[:newline])
+            if (
+                header.get("format") != AUTOMATON_FORMAT
+                or header.get("byteorder") != sys.byteorder
+                or header.get("revision") != revision
+            ):
+                return None
+            offset = newline + 1
+            arrays = []
+            for typecode, count in (("q", "edges"), ("i", "edges"), ("i", "nodes"), ("i", "nodes"), ("i", "nodes")):
+                values = array(typecode)
+                size = values.itemsize * header[count]
+                values.frombytes(data[offset:offset + size])
+                if len(values) != header[count]:
+                    return None
+                offset += size
+                arrays.append(values)
+            sources, targets = json.loads(data[offset:].decode("utf-8"))
+        except (ValueError, KeyError):
+            # Truncated or corrupt; compiled again from the store.
+            return None
+        edges, states, fail, out, link = arrays
+        return cls(revision, dict(zip(edges, states)), fail, out, link, sources, targets)
+
+
+class Glossary:
+    def __init__(self, path: Path = GLOSSARY_FILE, automaton_path: Path = AUTOMATON_FILE):
+        self._path = path
+        self._automaton_path = automaton_path
+        self._lock = threading.Lock()
+        # Held while an automaton is loaded or compiled, which can take seconds;
+        # _lock is only held for the quick reads and the swap.
+        self._build_lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._automaton: Automaton | None = None
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if self._conn is None:
+            try:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self._path), check_same_thread=False)
+                conn.executescript(
+                    "CREATE TABLE IF NOT EXISTS terms ("
+                    " source TEXT NOT NULL,"
+                    " target_lang TEXT NOT NULL,"
+                    " target TEXT NOT NULL,"
+                    " PRIMARY KEY (source, target_lang));"
+                    "CREATE TABLE IF NOT EXISTS meta ("
+                    " key TEXT PRIMARY KEY,"
+                    " value INTEGER NOT NULL);"
+                    "INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0);"
+                    # Tells a recreated store from the one a cached automaton was compiled from.
+                    "INSERT OR IGNORE INTO meta (key, value) VALUES ('store', abs(random()));"
+                )
+                self._conn = conn
+            except sqlite3.Error:
+                traceback.print_exc()
+        return self._conn
+
+    def _revision(self, conn: sqlite3.Connection) -> str:
+        meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        return f"{meta['store']:x}.{meta['revision']}"
+
+    def _changed(self, conn: sqlite3.Connection):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'revision'")
+        conn.commit()
+
+    def _current(self, wait: bool = False) -> Automaton | None:
+        # Reloaded whenever the store has changed, including from another process.
+        # While another thread compiles, lookups keep using the previous automaton.
+        if not self._build_lock.acquire(blocking=wait):
+            with self._lock:
+                previous = self._automaton
+            if previous is not None:
+                return previous
+            self._build_lock.acquire()
+        try:
+            return self._refresh()
+        finally:
+            self._build_lock.release()
+
+    def _refresh(self) -> Automaton | None:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                revision = self._revision(conn)
+            except sqlite3.Error:
+                traceback.print_exc()
+                return None
+            if self._automaton is not None and self._automaton.revision == revision:
+                return self._automaton
+        automaton = Automaton.load(self._automaton_path, revision)
+        if automaton is None:
+            with self._lock:
+                try:
+                    rows = conn.execute("SELECT source, target_lang, target FROM terms").fetchall()
+                except sqlite3.Error:
+                    traceback.print_exc()
+                    return None
+            automaton = Automaton.build(revision, rows)
+            try:
+                automaton.save(self._automaton_path)
+            except OSError:
+                traceback.print_exc()
+        with self._lock:
+            self._automaton = automaton
+        return automaton
+
+    def load(self):
+        self._current(wait=True)
+
+    def revision(self) -> str:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return ""
+            try:
+                return self._revision(conn)
+            except sqlite3.Error:
+                traceback.print_exc()
+                return ""
+
+    def lookup(self, target_lang: str, text: str) -> list[GlossaryEntry]:
+        automaton = self._current()
+        if automaton is None or not len(automaton):
+            return []
+        return automaton.lookup(target_lang, text)
+
+    def count(self) -> int:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return 0
+            try:
+                return conn.execute("SELECT COUNT(*) FROM terms").fetchone()[0]
+            except sqlite3.Error:
+                traceback.print_exc()
+                return 0
+
+    def entries(self) -> list[tuple[str, str, str]]:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return []
+            try:
+                return conn.execute(
+                    "SELECT source, target_lang, target FROM terms ORDER BY source, target_lang"
+                ).fetchall()
+            except sqlite3.Error:
+                traceback.print_exc()
+                return []
+
+    def add_many(self, rows: list[tuple[str, str, str]]):
+        # (source, target_lang, target); an empty target_lang applies to every language.
+        rows = [
+            (source.strip(), target_lang.strip(), target.strip())
+            for source, target_lang, target in rows
+            if source.strip() and target.strip()
+        ]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO terms (source, target_lang, target) VALUES (?, ?, ?)",
+                    rows,
+                )
+                self._changed(conn)
+            except sqlite3.Error:
+                traceback.print_exc()
+                return
+        # Compiled now, so the next start only has to load it.
+        self._current(wait=True)
+
+    def import_file(self, path: Path, target_lang: str = "") -> int:
+        # CSV, or tab-separated for .tsv/.txt: source, target[, target language].
+        delimiter = "\t" if path.suffix.lower() in (".tsv", ".txt") else ","
+        rows = []
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            for i, row in enumerate(csv.reader(f, delimiter=delimiter)):
+                if len(row) < 2 or (i == 0 and row[0].strip().lower() in _HEADERS):
+                    continue
+                rows.append((row[0], row[2] if len(row) > 2 and row[2].strip() else target_lang, row[1]))
+        self.add_many(rows)
+        return len(rows)
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute("DELETE FROM terms")
+                self._changed(conn)
+            except sqlite3.Error:
+                traceback.print_exc()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+glossary = Glossary()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m translator_app.glossary")
+    parser.add_argument("--import", dest="import_file", help="Add terms from a CSV/TSV file: source, target[, language]")
+    parser.add_argument("-t", "--target", default="", help="Target language of imported terms without one")
+    parser.add_argument("--list", action="store_true", help="Print all terms")
+    parser.add_argument("--clear", action="store_true", help="Remove all terms")
+    parser.add_argument("--match", help="Print the terms that would be sent with this text")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.clear:
+            glossary.clear()
+        if args.import_file:
+            count = glossary.import_file(Path(args.import_file), args.target)
+            print(f"{count} terms imported, {glossary.count()} in the glossary", file=sys.stderr)
+        if args.list:
+            for source, target_lang, target in glossary.entries():
+                print(f"{source}\t{target}\t{target_lang}")
+        if args.match is not None:
+            for entry in glossary.lookup(args.target, args.match):
+                print(f"{entry.source}\t{entry.target}")
+    finally:
+        glossary.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
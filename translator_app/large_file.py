@@ -0,0 +1,199 @@
+import asyncio
+import mmap
+import os
+import re
+from array import array
+from concurrent.futures import CancelledError, Future
+from pathlib import Path
+from typing import Callable
+
+from .cache import TranslationCache
+from .config import Config
+from .engine import MAX_PARALLEL_SEGMENTS, TranslationJob
+from .event_loop import event_loop
+from .memory import TranslationMemory
+from .metrics import RequestMetrics
+from .segmenter import DEFAULT_SEGMENT_TOKENS
+
+# Segments are cut on paragraph breaks by byte size so the file never has to be
+# decoded as a whole; 3 bytes per token errs on the small side for CJK text.
+SEGMENT_BYTES = DEFAULT_SEGMENT_TOKENS * 3
+
+_PARAGRAPH_BREAK = re.compile(rb"\r?\n[ \t\r]*\n\s*")
+_UTF8_BOM = b"\xef\xbb\xbf"
+
+
+class MappedDocument:
+    def __init__(self, path: str | os.PathLike):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        # mmap cannot map empty files.
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        if self._data[:2] in (b"\xff\xfe", b"\xfe\xff"):
+            self.close()
+            raise ValueError("仅支持 UTF-8 编码的文本文件")
+        # Byte offsets of each segment's text end and of the separator after it.
+        self._starts = array("q")
+        self._ends = array("q")
+        self._separator_ends = array("q")
+        self._index()
+
+    def _add(self, start: int, end: int, separator_end: int):
+        self._starts.append(start)
+        self._ends.append(end)
+        self._separator_ends.append(separator_end)
+
+    def _cut(self, start: int, end: int) -> int:
+        # Prefer a line break, then a space, then any character boundary.
+        for needle in (b"\n", b" "):
+            cut = self._data.rfind(needle, start + 1, end)
+            if cut > start:
+                return cut + 1
+        cut = end
+        while cut > start + 1 and self._data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        return cut
+
+    def _index(self):
+        start = len(_UTF8_BOM) if self._data[:3] == _UTF8_BOM else 0
+        end = end_separator = start
+        for match in _PARAGRAPH_BREAK.finditer(self._data, start):
+            # Paragraphs are packed into one segment until the budget is reached.
+            if match.start() - start > SEGMENT_BYTES and end > start:
+                self._add(start, end, end_separator)
+                start = end_separator
+            while match.start() - start > SEGMENT_BYTES:
+                cut = self._cut(start, start + SEGMENT_BYTES)
+                self._add(start, cut, cut)
+                start = cut
+            end, end_separator = match.start(), match.end()
+        if end > start:
+            self._add(start, end, end_separator)
+            start = end_separator
+        while self.size - start > SEGMENT_BYTES:
+            cut = self._cut(start, start + SEGMENT_BYTES)
+            self._add(start, cut, cut)
+            start = cut
+        if self.size > start:
+            self._add(start, self.size, self.size)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def text(self, index: int) -> str:
+        return self._data[self._starts[index]:self._ends[index]].decode("utf-8", errors="replace")
+
+    def preview(self, index: int, chars: int) -> str:
+        # Enough bytes for `chars` characters of any script.
+        end = min(self._ends[index], self._starts[index] + chars * 4)
+        return self._data[self._starts[index]:end].decode("utf-8", errors="ignore")[:chars]
+
+    def separator(self, index: int) -> str:
+        return self._data[self._ends[index]:self._separator_ends[index]].decode("utf-8", errors="replace")
+
+    def export(self, path: str | os.PathLike, results: list[str | None]) -> int:
+        # Streams segment by segment; untranslated segments keep their source text.
+        path = Path(path)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        missing = 0
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            for i, result in enumerate(results):
+                if result is None:
+                    missing += 1
+                    result = self.text(i)
+                f.write(result)
+                f.write(self.separator(i))
+        os.replace(tmp, path)
+        return missing
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+class DocumentTranslation:
+    def __init__(
+        self,
+        config: Config,
+        document: MappedDocument,
+        target_lang: str,
+        cache: TranslationCache | None = None,
+        memory: TranslationMemory | None = None,
+        on_segment: Callable[[int], None] | None = None,
+        on_progress: Callable[[int, int], None] | None = None,
+    ):
+        self._config = config
+        self._document = document
+        self._target_lang = target_lang
+        self._cache = cache
+        self._memory = memory
+        # Public so a resumed run can report to a different listener.
+        self.on_segment = on_segment or (lambda index: None)
+        self.on_progress = on_progress or (lambda done, total: None)
+        self._cancelled = False
+        self._future: Future | None = None
+        self.results: list[str | None] = [None] * len(document)
+        self.requests: list[RequestMetrics] = []
+        self._completed = 0
+
+    @property
+    def target_lang(self) -> str:
+        return self._target_lang
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def completed(self) -> int:
+        return self._completed
+
+    def start(self) -> Future:
+        self._cancelled = False
+        self._future = event_loop.submit(self.run_async())
+        return self._future
+
+    def cancel(self):
+        self._cancelled = True
+        if self._future is not None:
+            self._future.cancel()
+
+    def run(self):
+        try:
+            self.start().result()
+        except CancelledError:
+            pass
+        except BaseException:
+            self.cancel()
+            raise
+
+    async def run_async(self):
+        # Segments finished by an earlier, interrupted run are kept.
+        todo = iter([i for i, result in enumerate(self.results) if result is None])
+        self._completed = sum(result is not None for result in self.results)
+        workers = [asyncio.ensure_future(self._worker(todo)) for _ in range(MAX_PARALLEL_SEGMENTS)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            raise
+
+    async def _worker(self, todo):
+        # Workers share one iterator, so only the segments being translated are decoded.
+        for index in todo:
+            text = self._document.text(index)
+            if text.strip():
+                job = TranslationJob(self._config, text, self._target_lang, self._cache, memory=self._memory)
+                try:
+                    result = await job.run_async()
+                finally:
+                    self.requests.extend(job.requests)
+            else:
+                result = text
+            self.results[index] = result
+            self._completed += 1
+            self.on_segment(index)
+            self.on_progress(self._completed, len(self.results))
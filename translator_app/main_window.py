@@ -1,14 +1,34 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QComboBox, QTextEdit, QPushButton, QStatusBar, QApplication,
-    QMessageBox, QSplitter,
+    QMessageBox, QSplitter, QStackedWidget, QTabWidget, QMenu, QCheckBox,
+    QFileDialog,
 )
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QShortcut, QKeySequence
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QShortcut, QKeySequence, QAction
 
 from .config import Config
-from .api_client import TranslateWorker
-from .settings import SettingsDialog
+from .cache import TranslationCache
+from .alignment import AlignedBlock, Alignment, plan_blocks
+from .api_client import DocumentTranslationHandle, FileTranslationHandle, TranslationHandle, WarmupHandle
+from .clients import client_manager
+from .document_view import DocumentView
+from .engine import build_system_prompt
+from .event_loop import event_loop
+from .formats import PARSERS, FileTranslation
+from .glossary import glossary
+from .large_file import DocumentTranslation, MappedDocument
+from .memory import TranslationMemory
+from .metrics import RequestMetrics, summarize as summarize_requests
+from .segmenter import split_segments
+from .stream_renderer import StreamRenderer
 
 TARGET_LANGUAGES = [
     "中文", "英文", "日文", "韩文",
@@ -16,6 +36,9 @@ TARGET_LANGUAGES = [
     "意大利文", "阿拉伯文", "泰文", "越南文",
 ]
 
+LIVE_DEBOUNCE_MS = 600
+WARMUP_DELAY_MS = 500
+
 STYLESHEET = """
 QMainWindow {
     background: #f5f6fa;
@@ -82,11 +105,35 @@ QStatusBar {
 """
 
 
+class _TargetRun:
+    def __init__(self, lang: str, edit: QTextEdit, renderer: StreamRenderer, worker: TranslationHandle):
+        self.lang = lang
+        self.edit = edit
+        self.renderer = renderer
+        self.worker = worker
+        self.started = time.perf_counter()
+        self.elapsed: float | None = None
+        self.failed = False
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self._config = Config()
-        self._worker: TranslateWorker | None = None
+        self._cache = TranslationCache()
+        self._memory = TranslationMemory()
+        self._worker: TranslationHandle | None = None
+        self._alignment: Alignment | None = None
+        self._blocks: list[AlignedBlock] = []
+        self._blocks_key: tuple = ()
+        self._multi_runs: list[_TargetRun] = []
+        self._multi_started = 0.0
+        self._live_run = False
+        self._last_request: tuple = ()
+        self._document: MappedDocument | None = None
+        self._document_translation: DocumentTranslation | None = None
+        self._document_worker: DocumentTranslationHandle | None = None
+        self._file_worker: FileTranslationHandle | None = None
         self.setWindowTitle("翻译助手")
         self.resize(920, 600)
         self.setStyleSheet(STYLESHEET)
@@ -109,6 +156,17 @@ class MainWindow(QMainWindow):
         self._combo_target.addItems(TARGET_LANGUAGES)
         top_bar.addWidget(self._combo_target)
 
+        self._btn_multi = QPushButton("多语言")
+        self._btn_multi.setProperty("secondary", True)
+        self._menu_multi = QMenu(self._btn_multi)
+        for lang in TARGET_LANGUAGES:
+            action = QAction(lang, self._menu_multi)
+            action.setCheckable(True)
+            action.toggled.connect(self._on_multi_targets_changed)
+            self._menu_multi.addAction(action)
+        self._btn_multi.setMenu(self._menu_multi)
+        top_bar.addWidget(self._btn_multi)
+
         top_bar.addStretch()
 
         self._btn_settings = QPushButton("⚙ 设置")
@@ -127,9 +185,25 @@ class MainWindow(QMainWindow):
         left_layout.setSpacing(6)
         self._edit_source = QTextEdit()
         self._edit_source.setPlaceholderText("在此输入要翻译的文本...")
+        self._edit_source.textChanged.connect(self._on_source_changed)
         left_layout.addWidget(self._edit_source)
         left_btn_row = QHBoxLayout()
+        self._check_live = QCheckBox("实时翻译")
+        self._check_live.setToolTip("停止输入片刻后自动翻译")
+        self._check_live.setChecked(self._config.live_translate)
+        self._check_live.toggled.connect(self._on_live_toggled)
+        left_btn_row.addWidget(self._check_live)
         left_btn_row.addStretch()
+        self._btn_open = QPushButton("打开文件")
+        self._btn_open.setProperty("secondary", True)
+        self._btn_open.setToolTip("以只读方式打开大文件，按段加载和显示")
+        self._btn_open.clicked.connect(self._on_open_file)
+        left_btn_row.addWidget(self._btn_open)
+        self._btn_file = QPushButton("翻译文件")
+        self._btn_file.setProperty("secondary", True)
+        self._btn_file.setToolTip("翻译字幕、PO、JSON 或 Markdown 文件中的文本，保留原有结构")
+        self._btn_file.clicked.connect(self._on_translate_file)
+        left_btn_row.addWidget(self._btn_file)
         self._btn_clear = QPushButton("清空")
         self._btn_clear.setProperty("secondary", True)
         self._btn_clear.setFixedWidth(70)
@@ -144,7 +218,16 @@ class MainWindow(QMainWindow):
         self._edit_target = QTextEdit()
         self._edit_target.setPlaceholderText("翻译结果将在这里显示...")
         self._edit_target.setReadOnly(True)
-        right_layout.addWidget(self._edit_target)
+        self._tabs_multi = QTabWidget()
+        self._result_stack = QStackedWidget()
+        self._result_stack.addWidget(self._edit_target)
+        self._result_stack.addWidget(self._tabs_multi)
+        right_layout.addWidget(self._result_stack)
+        self._renderer = StreamRenderer(
+            self._edit_target,
+            coalesce=os.environ.get("TRANSLATOR_RENDER_MODE") != "per-chunk",
+            parent=self,
+        )
         right_btn_row = QHBoxLayout()
         right_btn_row.addStretch()
         self._btn_copy = QPushButton("复制")
@@ -158,7 +241,15 @@ class MainWindow(QMainWindow):
         splitter.addWidget(right_panel)
         splitter.setStretchFactor(0, 1)
         splitter.setStretchFactor(1, 1)
-        root.addWidget(splitter, 1)
+
+        # Opened files replace both editors with a segment table.
+        self._document_view = DocumentView()
+        self._document_view.export_requested.connect(self._on_export)
+        self._document_view.close_requested.connect(self._close_document)
+        self._view_stack = QStackedWidget()
+        self._view_stack.addWidget(splitter)
+        self._view_stack.addWidget(self._document_view)
+        root.addWidget(self._view_stack, 1)
 
         # Translate button
         btn_row = QHBoxLayout()
@@ -175,34 +266,232 @@ class MainWindow(QMainWindow):
         self._status_bar = QStatusBar()
         self.setStatusBar(self._status_bar)
         self._status_bar.showMessage("就绪")
+        self._metrics_label = QLabel()
+        self._status_bar.addPermanentWidget(self._metrics_label)
 
         # Shortcut
         shortcut = QShortcut(QKeySequence("Ctrl+Return"), self)
         shortcut.activated.connect(self._on_translate)
 
+        self._live_timer = QTimer(self)
+        self._live_timer.setSingleShot(True)
+        self._live_timer.setInterval(LIVE_DEBOUNCE_MS)
+        self._live_timer.timeout.connect(self._on_live_timeout)
+
+        self._warmup = WarmupHandle(self._config)
+        self._warmup.warmed.connect(self._on_warmed)
+        # After the first paint, so importing the SDK does not delay the window.
+        QTimer.singleShot(WARMUP_DELAY_MS, self._on_startup_idle)
+
     def _restore_lang_selection(self):
         tgt = self._config.target_lang
         idx_tgt = self._combo_target.findText(tgt)
         if idx_tgt >= 0:
             self._combo_target.setCurrentIndex(idx_tgt)
+        selected = set(self._config.multi_targets)
+        for action in self._menu_multi.actions():
+            action.blockSignals(True)
+            action.setChecked(action.text() in selected)
+            action.blockSignals(False)
+        self._update_multi_button()
+
+    def _selected_targets(self) -> list[str]:
+        return [action.text() for action in self._menu_multi.actions() if action.isChecked()]
+
+    def _update_multi_button(self):
+        count = len(self._selected_targets())
+        self._btn_multi.setText(f"多语言 ({count})" if count else "多语言")
+        self._combo_target.setEnabled(count < 2)
+
+    def _on_multi_targets_changed(self):
+        self._update_multi_button()
+        self._config.multi_targets = self._selected_targets()
+        self._config.save()
 
     def _on_open_settings(self):
+        from .settings import SettingsDialog
+
         dlg = SettingsDialog(self._config, self)
-        dlg.exec()
+        if dlg.exec():
+            self._warmup.start()
+
+    def _on_startup_idle(self):
+        self._warmup.start()
+        if self._config.use_glossary:
+            # Loads the compiled glossary before the first translation needs it.
+            event_loop.submit(asyncio.to_thread(glossary.load))
+
+    def _on_warmed(self, message: str):
+        if not self._status_bar.currentMessage() or self._status_bar.currentMessage() == "就绪":
+            self._status_bar.showMessage(message, 5000)
+
+    def _current_result_edit(self) -> QTextEdit:
+        if self._result_stack.currentIndex() == 1 and self._tabs_multi.count():
+            return self._tabs_multi.currentWidget()
+        return self._edit_target
 
     def _on_clear(self):
         self._edit_source.clear()
         self._edit_target.clear()
+        for run in self._multi_runs:
+            run.edit.clear()
         self._status_bar.showMessage("已清空")
 
+    def _on_open_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "打开文件", "", "文本文件 (*.txt *.md);;所有文件 (*)")
+        if not path:
+            return
+        try:
+            document = MappedDocument(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "无法打开文件", str(e))
+            return
+        self._close_document()
+        self._document = document
+        self._document_view.set_document(document)
+        self._view_stack.setCurrentIndex(1)
+        self._status_bar.showMessage(f"已打开 {document.path.name} · 共 {len(document)} 段")
+
+    def _on_translate_file(self):
+        if self._file_worker is not None:
+            self._cancel_file_worker()
+            self._status_bar.showMessage("已取消文件翻译", 3000)
+            return
+        if not self._config.api_key:
+            QMessageBox.warning(self, "提示", "请先在设置中配置 API Key。")
+            return
+        patterns = " ".join(f"*{suffix}" for suffix in PARSERS)
+        path, _ = QFileDialog.getOpenFileName(self, "翻译文件", "", f"结构化文件 ({patterns})")
+        if not path:
+            return
+        target_lang = self._combo_target.currentText()
+        source = Path(path)
+        output, _ = QFileDialog.getSaveFileName(
+            self, "保存译文", str(source.with_name(f"{source.stem}.{target_lang}{source.suffix}"))
+        )
+        if not output:
+            return
+        translation = FileTranslation(
+            self._config, source, output, target_lang, self._cache, self._memory
+        )
+        self._file_worker = FileTranslationHandle(translation)
+        self._file_worker.segment_progress.connect(self._on_file_progress)
+        self._file_worker.error_occurred.connect(self._on_file_error)
+        self._file_worker.finished_signal.connect(self._on_file_finished)
+        self._file_worker.start()
+        self._btn_file.setText("取消文件翻译")
+        self._status_bar.showMessage(f"正在翻译 {source.name}...")
+
+    def _on_file_progress(self, done: int, total: int):
+        name = self._file_worker.translation.source.name if self._file_worker is not None else ""
+        self._status_bar.showMessage(f"正在翻译 {name}... 已完成 {done}/{total} 条")
+
+    def _on_file_error(self, msg: str):
+        self._cancel_file_worker()
+        self._status_bar.showMessage(f"错误: {msg}")
+        QMessageBox.critical(self, "文件翻译失败", msg)
+
+    def _on_file_finished(self):
+        if self._file_worker is None:
+            return
+        translation = self._file_worker.translation
+        self._cancel_file_worker()
+        self._show_request_metrics(translation.requests)
+        message = f"已翻译 {translation.source.name} · {translation.written} 条文本"
+        if translation.untranslated:
+            message += f"，{translation.untranslated} 条未能翻译，保留原文"
+        self._status_bar.showMessage(message, 5000)
+
+    def _cancel_file_worker(self):
+        if self._file_worker is None:
+            return
+        self._file_worker.cancel()
+        self._file_worker.segment_progress.disconnect()
+        self._file_worker.error_occurred.disconnect()
+        self._file_worker.finished_signal.disconnect()
+        self._file_worker = None
+        self._btn_file.setText("翻译文件")
+
+    def _close_document(self):
+        if self._document is None:
+            return
+        self._cleanup_worker()
+        self._document_view.set_document(None)
+        self._document.close()
+        self._document = None
+        self._document_translation = None
+        self._view_stack.setCurrentIndex(0)
+        self._btn_translate.setEnabled(True)
+        self._btn_translate.setText("翻译  (Ctrl+Enter)")
+
+    def _on_export(self):
+        translation = self._document_translation
+        if self._document is None or translation is None or not translation.completed:
+            self._status_bar.showMessage("请先翻译后再导出", 3000)
+            return
+        source = self._document.path
+        path, _ = QFileDialog.getSaveFileName(
+            self, "导出译文", str(source.with_name(f"{source.stem}.{translation.target_lang}{source.suffix}"))
+        )
+        if not path:
+            return
+        try:
+            missing = self._document.export(path, translation.results)
+        except OSError as e:
+            QMessageBox.critical(self, "导出失败", str(e))
+            return
+        message = f"已导出到 {path}"
+        if missing:
+            message += f" · {missing} 段尚未翻译，保留原文"
+        self._status_bar.showMessage(message, 5000)
+
     def _on_copy(self):
-        text = self._edit_target.toPlainText()
+        if self._document is not None:
+            self._status_bar.showMessage("大文件请使用“导出”保存译文", 3000)
+            return
+        text = self._current_result_edit().toPlainText()
         if text:
             QApplication.clipboard().setText(text)
             self._status_bar.showMessage("已复制到剪贴板", 3000)
 
+    def _on_live_toggled(self, checked: bool):
+        self._config.live_translate = checked
+        self._config.save()
+        if checked:
+            self._live_timer.start()
+        else:
+            self._live_timer.stop()
+
+    def _on_source_changed(self):
+        if self._check_live.isChecked():
+            self._live_timer.start()
+
+    def _on_live_timeout(self):
+        self._translate(live=True)
+
     def _on_translate(self):
+        self._translate(live=False)
+
+    def _translate(self, live: bool):
+        self._live_timer.stop()
+        if self._document is not None:
+            if not live:
+                self._start_document()
+            return
         text = self._edit_source.toPlainText().strip()
+        targets = self._selected_targets()
+        if live:
+            # Typing only supersedes the running request when the text really changed.
+            if (text, targets) == self._last_request:
+                return
+            if not text or not self._config.api_key:
+                self._cleanup_worker()
+                self._last_request = ()
+                self._renderer.stop()
+                self._btn_translate.setEnabled(True)
+                self._btn_translate.setText("翻译  (Ctrl+Enter)")
+                return
+
         if not text:
             self._status_bar.showMessage("请输入要翻译的文本")
             return
@@ -211,6 +500,12 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "提示", "请先在设置中配置 API Key。")
             return
 
+        self._live_run = live
+        self._last_request = (text, targets)
+        if len(targets) > 1:
+            self._start_multi(text, targets)
+            return
+
         target_lang = self._combo_target.currentText()
 
         self._config.target_lang = target_lang
@@ -218,42 +513,259 @@ class MainWindow(QMainWindow):
 
         self._cleanup_worker()
 
+        # Paragraphs unchanged since the last run keep their translation.
+        self._blocks_key = (
+            target_lang,
+            self._config.model,
+            self._config.base_url,
+            build_system_prompt(self._config, target_lang),
+            glossary.revision() if self._config.use_glossary else "",
+        )
+        self._blocks = plan_blocks(text, self._alignment, self._blocks_key)
+        prefilled = [block.translation for block in self._blocks]
+        reused = sum(translation is not None for translation in prefilled)
+
+        self._result_stack.setCurrentIndex(0)
         self._edit_target.clear()
+        self._renderer.start()
         self._btn_translate.setEnabled(False)
         self._btn_translate.setText("翻译中...")
-        self._status_bar.showMessage("正在翻译...")
-
-        self._worker = TranslateWorker(
-            self._config, text, target_lang
+        if reused:
+            self._status_bar.showMessage(
+                f"正在增量翻译... 需重译 {len(prefilled) - reused}/{len(prefilled)} 段"
+            )
+        else:
+            self._status_bar.showMessage("正在翻译...")
+
+        self._worker = TranslationHandle(
+            self._config,
+            text,
+            target_lang,
+            self._cache,
+            [block.segment for block in self._blocks],
+            self._memory,
+            prefilled,
         )
-        self._worker.chunk_received.connect(self._on_chunk)
+        self._renderer.attach(self._worker.chunk_received)
         self._worker.error_occurred.connect(self._on_error)
         self._worker.finished_signal.connect(self._on_finished)
+        self._worker.segment_progress.connect(self._on_segment_progress)
         self._worker.start()
 
+    def _start_document(self):
+        if not self._config.api_key:
+            QMessageBox.warning(self, "提示", "请先在设置中配置 API Key。")
+            return
+        target_lang = self._combo_target.currentText()
+        self._config.target_lang = target_lang
+        self._config.save()
+        self._cleanup_worker()
+
+        # A run for the same language resumes; anything else starts over.
+        translation = self._document_translation
+        if translation is None or translation.target_lang != target_lang:
+            translation = DocumentTranslation(
+                self._config, self._document, target_lang, self._cache, self._memory
+            )
+            self._document_translation = translation
+        self._document_view.set_results(translation.results)
+        self._btn_translate.setEnabled(False)
+        self._btn_translate.setText("翻译中...")
+        self._status_bar.showMessage(f"正在翻译... 已完成 {translation.completed}/{len(self._document)} 段")
+
+        self._document_worker = DocumentTranslationHandle(translation)
+        self._document_worker.segment_translated.connect(self._document_view.segment_translated)
+        self._document_worker.segment_progress.connect(self._on_document_progress)
+        self._document_worker.error_occurred.connect(self._on_error)
+        self._document_worker.finished_signal.connect(self._on_document_finished)
+        self._document_worker.start()
+
+    def _on_document_progress(self, done: int, total: int):
+        self._document_view.update_label(done)
+        self._status_bar.showMessage(f"正在翻译... 已完成 {done}/{total} 段")
+
+    def _on_document_finished(self):
+        self._btn_translate.setEnabled(True)
+        self._btn_translate.setText("翻译  (Ctrl+Enter)")
+        if self._document_worker is None:
+            return
+        translation = self._document_worker.translation
+        self._document_view.update_label(translation.completed)
+        self._show_request_metrics(translation.requests)
+        self._status_bar.showMessage(
+            f"翻译完成 · 已翻译 {translation.completed}/{len(translation.results)} 段"
+            f" · 缓存命中 {self._cache.hits} / 未命中 {self._cache.misses}",
+            5000,
+        )
+
+    def _start_multi(self, text: str, targets: list[str]):
+        self._cleanup_worker()
+
+        stale = [self._tabs_multi.widget(i) for i in range(self._tabs_multi.count())]
+        self._tabs_multi.clear()
+        for widget in stale:
+            widget.deleteLater()
+        self._result_stack.setCurrentIndex(1)
+        self._btn_translate.setEnabled(False)
+        self._btn_translate.setText("翻译中...")
+        self._status_bar.showMessage(f"正在翻译为 {len(targets)} 种语言...")
+
+        segments = split_segments(text)
+        self._multi_started = time.perf_counter()
+        for lang in targets:
+            edit = QTextEdit()
+            edit.setReadOnly(True)
+            self._tabs_multi.addTab(edit, f"{lang} …")
+            renderer = StreamRenderer(
+                edit,
+                coalesce=os.environ.get("TRANSLATOR_RENDER_MODE") != "per-chunk",
+                parent=edit,
+            )
+            worker = TranslationHandle(self._config, text, lang, self._cache, segments, self._memory)
+            run = _TargetRun(lang, edit, renderer, worker)
+            renderer.attach(worker.chunk_received)
+            worker.error_occurred.connect(lambda msg, run=run: self._on_multi_error(run, msg))
+            worker.finished_signal.connect(lambda run=run: self._on_multi_finished(run))
+            worker.segment_progress.connect(
+                lambda done, total, run=run: self._on_multi_progress(run, done, total)
+            )
+            self._multi_runs.append(run)
+            renderer.start()
+
+        for run in self._multi_runs:
+            run.worker.start()
+
+    def _on_multi_progress(self, run: _TargetRun, done: int, total: int):
+        index = self._tabs_multi.indexOf(run.edit)
+        self._tabs_multi.setTabText(index, f"{run.lang} {done}/{total}")
+
+    def _on_multi_error(self, run: _TargetRun, msg: str):
+        run.failed = True
+        self._tabs_multi.setTabToolTip(self._tabs_multi.indexOf(run.edit), msg)
+
+    def _on_multi_finished(self, run: _TargetRun):
+        run.renderer.stop()
+        run.elapsed = time.perf_counter() - run.started
+        index = self._tabs_multi.indexOf(run.edit)
+        if run.failed:
+            self._tabs_multi.setTabText(index, f"{run.lang} ✗")
+        else:
+            self._tabs_multi.setTabText(index, f"{run.lang} ✓ {run.elapsed:.1f}s")
+            first = run.renderer.first_chunk_time
+            if first is not None:
+                self._tabs_multi.setTabToolTip(
+                    index, f"首字 {first - run.started:.2f}s · 总耗时 {run.elapsed:.2f}s"
+                )
+
+        done = [r for r in self._multi_runs if r.elapsed is not None]
+        slowest = max(done, key=lambda r: r.elapsed)
+        if len(done) < len(self._multi_runs):
+            self._status_bar.showMessage(
+                f"正在翻译... 已完成 {len(done)}/{len(self._multi_runs)} 种语言"
+                f" · 最慢 {slowest.lang} {slowest.elapsed:.1f}s"
+            )
+            return
+
+        self._btn_translate.setEnabled(True)
+        self._btn_translate.setText("翻译  (Ctrl+Enter)")
+        failed = [r.lang for r in done if r.failed]
+        total = time.perf_counter() - self._multi_started
+        summary = (
+            f"多语言翻译完成 · 总耗时 {total:.1f}s"
+            f" · 最慢 {slowest.lang} {slowest.elapsed:.1f}s"
+            f" · 累计 {sum(r.elapsed for r in done):.1f}s"
+        )
+        if failed:
+            summary += f" · 失败: {'、'.join(failed)}"
+        self._status_bar.showMessage(summary)
+        self._show_request_metrics([m for r in done for m in r.worker.job.requests])
+
     def _cleanup_worker(self):
+        # Cancelling closes the streams on the event loop; nothing to wait for here.
         if self._worker is not None:
+            self._worker.cancel()
             self._worker.chunk_received.disconnect()
             self._worker.error_occurred.disconnect()
             self._worker.finished_signal.disconnect()
-            if self._worker.isRunning():
-                self._worker.cancel()
-                self._worker.wait(3000)
+            self._worker.segment_progress.disconnect()
             self._worker = None
-
-    def _on_chunk(self, text: str):
-        self._edit_target.moveCursor(self._edit_target.textCursor().MoveOperation.End)
-        self._edit_target.insertPlainText(text)
+        for run in self._multi_runs:
+            run.worker.cancel()
+            run.worker.chunk_received.disconnect()
+            run.worker.error_occurred.disconnect()
+            run.worker.finished_signal.disconnect()
+            run.worker.segment_progress.disconnect()
+        self._multi_runs = []
+        if self._document_worker is not None:
+            self._document_worker.cancel()
+            self._document_worker.segment_translated.disconnect()
+            self._document_worker.segment_progress.disconnect()
+            self._document_worker.error_occurred.disconnect()
+            self._document_worker.finished_signal.disconnect()
+            self._document_worker = None
+
+    def _on_segment_progress(self, done: int, total: int):
+        self._status_bar.showMessage(f"正在翻译... 已完成 {done}/{total} 段")
 
     def _on_error(self, msg: str):
         self._status_bar.showMessage(f"错误: {msg}")
-        QMessageBox.critical(self, "翻译失败", msg)
+        if not self._live_run:
+            QMessageBox.critical(self, "翻译失败", msg)
 
     def _on_finished(self):
+        self._renderer.stop()
+        if os.environ.get("TRANSLATOR_RENDER_STATS"):
+            print(json.dumps(self._renderer.stats()), file=sys.stderr, flush=True)
         self._btn_translate.setEnabled(True)
         self._btn_translate.setText("翻译  (Ctrl+Enter)")
-        self._status_bar.showMessage("翻译完成", 5000)
+        pool = client_manager.stats()
+        summary = (
+            f"翻译完成 · 缓存命中 {self._cache.hits} / 未命中 {self._cache.misses}"
+            f" · 连接复用 {pool['reused']} / 请求 {pool['requests']}"
+        )
+        if self._worker is not None:
+            job = self._worker.job
+            self._show_request_metrics(job.requests)
+            if job.coalesced:
+                summary += f" · 合并重复请求 {job.coalesced}"
+            if job.retries:
+                summary += f" · 限流/出错重试 {job.retries}"
+            if all(result is not None for result in job.results):
+                self._alignment = Alignment.from_results(self._blocks_key, self._blocks, job.results)
+            if job.reused:
+                summary += f" · 增量翻译 复用 {job.reused}/{job.segment_count} 段"
+            if job.failovers:
+                summary += f" · 切换端点 {job.failovers} 次"
+            if job.hedged:
+                summary += f" · 对冲请求 {job.hedged} 次"
+            if job.continuations:
+                summary += f" · 截断续写 {job.continuations} 次"
+            if job.glossary_terms:
+                summary += f" · 术语 {job.glossary_terms} 条"
+            if job.memory_exact or job.memory_fuzzy or job.memory_sentences:
+                summary += (
+                    f" · 翻译记忆 命中 {job.memory_exact}/{job.segment_count} 段"
+                    f"，复用 {job.memory_sentences} 句，相似 {job.memory_fuzzy} 段"
+                )
+        self._status_bar.showMessage(summary, 5000)
+
+    def _show_request_metrics(self, requests: list[RequestMetrics]):
+        summary = summarize_requests(requests)
+        if not summary:
+            return
+        self._metrics_label.setText(summary)
+        self._metrics_label.setToolTip(
+            "\n".join(json.dumps(r.to_dict(), ensure_ascii=False) for r in requests[-5:])
+        )
 
     def closeEvent(self, event):
+        self._config.flush()
+        self._warmup.stop()
         self._cleanup_worker()
+        self._cancel_file_worker()
+        self._close_document()
+        self._cache.close()
+        self._memory.close()
+        glossary.close()
+        event_loop.stop()
         super().closeEvent(event)
@@ -0,0 +1,224 @@
+import hashlib
+import random
+import re
+import sqlite3
+import threading
+import time
+import traceback
+import zlib
+from array import array
+from pathlib import Path
+
+from .config import CONFIG_DIR
+from .segmenter import split_sentences
+
+MEMORY_FILE = CONFIG_DIR / "memory.sqlite3"
+
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SHINGLE = 3
+FUZZY_THRESHOLD = 0.6
+# Bounds the work per lookup when a band bucket is very common.
+MAX_BUCKET = 64
+MAX_CANDIDATES = 16
+# Bumped when the stored band hashes change; older stores are re-indexed on open.
+INDEX_VERSION = 1
+# A sentence pair is trusted when its length ratio is within this factor of the whole text's.
+MAX_RATIO_SKEW = 2.0
+
+_BAND_PROBE = f"SELECT * FROM (SELECT segment_id FROM bands WHERE band = ? AND hash = ? LIMIT {MAX_BUCKET})"
+
+_MASKS = [random.Random(1729 + i).getrandbits(32) for i in range(NUM_PERM)]
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    # Exact matches only forgive whitespace; "Apple" and "apple" may translate differently.
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _exact_key(target_lang: str, text: str) -> str:
+    return hashlib.sha256(f"{target_lang}\0{_normalize(text)}".encode("utf-8")).hexdigest()
+
+
+def _signature(text: str) -> array:
+    normalized = _normalize(text).lower()
+    if len(normalized) <= SHINGLE:
+        shingles = {normalized}
+    else:
+        shingles = {normalized[i:i + SHINGLE] for i in range(len(normalized) - SHINGLE + 1)}
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    return array("I", [min(map(mask.__xor__, hashes)) for mask in _MASKS])
+
+
+def _band_hashes(signature: array) -> list[tuple[int, int]]:
+    # Stored on disk, so the hash must not depend on the Python build or the byte order.
+    return [
+        (band, int.from_bytes(hashlib.blake2b(
+            b"".join(value.to_bytes(4, "little") for value in signature[band * ROWS:(band + 1) * ROWS]),
+            digest_size=8,
+        ).digest(), "little", signed=True))
+        for band in range(BANDS)
+    ]
+
+
+def _similarity(a: array, b: array) -> float:
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+class MemoryMatch:
+    def __init__(self, source: str, target: str, similarity: float):
+        self.source = source
+        self.target = target
+        self.similarity = similarity
+
+    @property
+    def exact(self) -> bool:
+        return self.similarity >= 1.0
+
+
+def sentence_pairs(source: str, target: str) -> list[tuple[str, str]]:
+    # Sentences are only paired up when both sides split into as many and every
+    # pair's length ratio is close to the whole text's; a mispaired sentence would
+    # later be reused as an exact match. Otherwise the text is kept as one entry.
+    sources = split_sentences(source)
+    targets = split_sentences(target)
+    if len(sources) == 1 or len(sources) != len(targets):
+        return [(source, target)]
+    pairs = [(s.strip(), t.strip()) for (s, _), (t, _) in zip(sources, targets)]
+    if not all(s and t for s, t in pairs):
+        return [(source, target)]
+    ratio = sum(len(t) for _, t in pairs) / sum(len(s) for s, _ in pairs)
+    for s, t in pairs:
+        skew = len(t) / len(s) / ratio
+        if not 1 / MAX_RATIO_SKEW <= skew <= MAX_RATIO_SKEW:
+            return [(source, target)]
+    return pairs
+
+
+class TranslationMemory:
+    def __init__(self, path: Path = MEMORY_FILE):
+        self._path = path
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if self._conn is None:
+            try:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self._path), check_same_thread=False)
+                conn.executescript(
+                    "CREATE TABLE IF NOT EXISTS segments ("
+                    " id INTEGER PRIMARY KEY,"
+                    " key TEXT UNIQUE NOT NULL,"
+                    " target_lang TEXT NOT NULL,"
+                    " source TEXT NOT NULL,"
+                    " target TEXT NOT NULL,"
+                    " signature BLOB NOT NULL,"
+                    " created REAL NOT NULL);"
+                    "CREATE TABLE IF NOT EXISTS bands ("
+                    " band INTEGER NOT NULL,"
+                    " hash INTEGER NOT NULL,"
+                    " segment_id INTEGER NOT NULL);"
+                    "CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, hash);"
+                )
+                if conn.execute("PRAGMA user_version").fetchone()[0] < INDEX_VERSION:
+                    self._reindex(conn)
+                self._conn = conn
+            except sqlite3.Error:
+                traceback.print_exc()
+        return self._conn
+
+    def _reindex(self, conn: sqlite3.Connection):
+        # Band hashes used to come from hash(), which is not stable across builds.
+        conn.execute("DELETE FROM bands")
+        for segment_id, blob in conn.execute("SELECT id, signature FROM segments").fetchall():
+            conn.executemany(
+                "INSERT INTO bands (band, hash, segment_id) VALUES (?, ?, ?)",
+                [(band, value, segment_id) for band, value in _band_hashes(array("I", blob))],
+            )
+        conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        conn.commit()
+
+    def lookup(self, target_lang: str, source: str, fuzzy: bool = True) -> MemoryMatch | None:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT source, target FROM segments WHERE key = ?",
+                    (_exact_key(target_lang, source),),
+                ).fetchone()
+                if row is not None:
+                    return MemoryMatch(row[0], row[1], 1.0)
+                if not fuzzy:
+                    return None
+
+                signature = _signature(source)
+                bands = _band_hashes(signature)
+                rows = conn.execute(
+                    "SELECT s.source, s.target, s.signature FROM segments s JOIN ("
+                    " SELECT segment_id, COUNT(*) AS votes FROM ("
+                    + " UNION ALL ".join([_BAND_PROBE] * len(bands))
+                    + ") GROUP BY segment_id ORDER BY votes DESC LIMIT ?"
+                    ") c ON s.id = c.segment_id WHERE s.target_lang = ?",
+                    [value for pair in bands for value in pair] + [MAX_CANDIDATES, target_lang],
+                ).fetchall()
+            except sqlite3.Error:
+                traceback.print_exc()
+                return None
+
+        best = None
+        for cand_source, cand_target, blob in rows:
+            similarity = min(_similarity(signature, array("I", blob)), 0.99)
+            if similarity >= FUZZY_THRESHOLD and (best is None or similarity > best.similarity):
+                best = MemoryMatch(cand_source, cand_target, similarity)
+        return best
+
+    def add(self, target_lang: str, source: str, target: str):
+        self.add_many(target_lang, [(source, target)])
+
+    def add_many(self, target_lang: str, pairs: list[tuple[str, str]]):
+        entries = [
+            (source, target, _signature(source))
+            for source, target in pairs
+            if source.strip() and target.strip()
+        ]
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                for source, target, signature in entries:
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO segments"
+                        " (key, target_lang, source, target, signature, created)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (
+                            _exact_key(target_lang, source),
+                            target_lang,
+                            source,
+                            target,
+                            signature.tobytes(),
+                            now,
+                        ),
+                    )
+                    if cursor.rowcount:
+                        conn.executemany(
+                            "INSERT INTO bands (band, hash, segment_id) VALUES (?, ?, ?)",
+                            [(band, value, cursor.lastrowid) for band, value in _band_hashes(signature)],
+                        )
+                conn.commit()
+            except sqlite3.Error:
+                traceback.print_exc()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,321 @@
+"""Request metrics export. Usage: python -m translator_app.metrics [--prometheus FILE] [--last N] [--ttft]"""
+
+import argparse
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+
+from .config import CONFIG_DIR
+
+METRICS_FILE = CONFIG_DIR / "metrics.jsonl"
+PROMETHEUS_ENV = "TRANSLATOR_PROMETHEUS_TEXTFILE"
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUPS = 3
+
+# Seconds; shared by the connect, TTFT and duration histograms.
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class RequestMetrics:
+    def __init__(self, model: str, base_url: str):
+        self.model = model
+        self.base_url = base_url
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self._connect_started: float | None = None
+        self.queue_ms = 0.0
+        self.connect_ms = 0.0
+        self.reused = True
+        self.ttft_ms: float | None = None
+        self.duration_ms = 0.0
+        self.chunks = 0
+        self.chars = 0
+        self.prompt_tokens: int | None = None
+        self.completion_tokens: int | None = None
+        # Prompt tokens served from the provider's prefix cache, when reported.
+        self.cached_tokens: int | None = None
+        self.tokens_estimated = False
+        # "length" when the model stopped at its output limit.
+        self.finish_reason: str | None = None
+        # 0 for the first try; retries after a rate limit or server error count up.
+        self.attempt = 0
+        self.status = "ok"
+
+    def on_connect_started(self):
+        self._connect_started = time.perf_counter()
+        self.reused = False
+
+    def on_connected(self):
+        if self._connect_started is not None:
+            self.connect_ms = (time.perf_counter() - self._connect_started) * 1000
+
+    def on_chunk(self, text: str):
+        if self.ttft_ms is None:
+            self.ttft_ms = (time.perf_counter() - self._t0) * 1000
+        self.chunks += 1
+        self.chars += len(text)
+
+    def finish(self, status: str = "ok"):
+        self.duration_ms = (time.perf_counter() - self._t0) * 1000
+        self.status = status
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        if not self.completion_tokens or self.ttft_ms is None:
+            return None
+        generation = (self.duration_ms - self.ttft_ms) / 1000
+        return self.completion_tokens / generation if generation > 0 else None
+
+    def to_dict(self) -> dict:
+        return {
+            "time": self.started,
+            "model": self.model,
+            "base_url": self.base_url,
+            "status": self.status,
+            "queue_ms": round(self.queue_ms, 2),
+            "reused_connection": self.reused,
+            "connect_ms": round(self.connect_ms, 2),
+            "ttft_ms": None if self.ttft_ms is None else round(self.ttft_ms, 2),
+            "duration_ms": round(self.duration_ms, 2),
+            "chunks": self.chunks,
+            "chars": self.chars,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "tokens_estimated": self.tokens_estimated,
+            "finish_reason": self.finish_reason,
+            "attempt": self.attempt,
+        }
+
+
+# The request being sent by the current task, so httpx trace callbacks can
+# attribute connection setup to it.
+current_request: contextvars.ContextVar[RequestMetrics | None] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+def cache_hit_ratio(requests: list[RequestMetrics]) -> float | None:
+    # Share of prompt tokens read from the prefix cache, over requests that report it.
+    reported = [r for r in requests if r.cached_tokens is not None and r.prompt_tokens]
+    if not reported:
+        return None
+    return sum(r.cached_tokens for r in reported) / sum(r.prompt_tokens for r in reported)
+
+
+def summarize(requests: list[RequestMetrics]) -> str:
+    done = [r for r in requests if r.status == "ok"]
+    if not done:
+        return ""
+    first = min(done, key=lambda r: r.started)
+    tokens = sum(r.completion_tokens or 0 for r in done)
+    rates = [r.tokens_per_second for r in done if r.tokens_per_second]
+    parts = [f"连接 {first.connect_ms:.0f}ms" if not first.reused else "连接复用"]
+    queued = max(r.queue_ms for r in done)
+    if queued >= 1:
+        parts.insert(0, f"排队 {queued:.0f}ms")
+    if first.ttft_ms is not None:
+        parts.append(f"首字 {first.ttft_ms:.0f}ms")
+    parts.append(f"{tokens} tokens")
+    ratio = cache_hit_ratio(done)
+    if ratio is not None:
+        parts.append(f"提示缓存 {ratio:.0%}")
+    if rates:
+        parts.append(f"{sum(rates) / len(rates):.0f} tok/s")
+    if len(done) > 1:
+        parts.append(f"{len(done)} 次请求")
+    return " · ".join(parts)
+
+
+def _percentile(values: list[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def ttft_report(records) -> list[str]:
+    # Cold starts had to open a connection first; warm ones reused a pooled (e.g. pre-warmed) one.
+    groups = {"cold": [], "warm": []}
+    for record in records:
+        if record["status"] == "ok" and record["ttft_ms"] is not None:
+            groups["warm" if record["reused_connection"] else "cold"].append(record["ttft_ms"])
+    lines = []
+    for name, values in groups.items():
+        if values:
+            lines.append(
+                f"{name}: {len(values)} requests, first token median {_percentile(values, 0.5):.0f} ms,"
+                f" p95 {_percentile(values, 0.95):.0f} ms"
+            )
+        else:
+            lines.append(f"{name}: no requests")
+    return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class PrometheusAggregate:
+    def __init__(self):
+        self._counters: dict[tuple, float] = {}
+        self._histograms: dict[tuple, list] = {}
+
+    def _count(self, name: str, labels: tuple, value: float = 1.0):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def _observe(self, name: str, labels: tuple, seconds: float):
+        key = (name, labels)
+        histogram = self._histograms.setdefault(key, [[0] * len(BUCKETS), 0, 0.0])
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[0][i] += 1
+        histogram[1] += 1
+        histogram[2] += seconds
+
+    def add(self, record: dict):
+        labels = (("model", record["model"]), ("base_url", record["base_url"]))
+        self._count("translator_requests_total", labels + (("status", record["status"]),))
+        # Older records predate the scheduler.
+        if record.get("queue_ms"):
+            self._observe("translator_queue_wait_seconds", labels, record["queue_ms"] / 1000)
+        if record["status"] != "ok":
+            return
+        self._count("translator_output_chars_total", labels, record["chars"])
+        self._count("translator_output_chunks_total", labels, record["chunks"])
+        self._count("translator_output_tokens_total", labels, record["completion_tokens"] or 0)
+        self._count("translator_prompt_tokens_total", labels, record["prompt_tokens"] or 0)
+        if record.get("cached_tokens") is not None:
+            self._count("translator_cached_prompt_tokens_total", labels, record["cached_tokens"])
+        if not record["reused_connection"]:
+            self._observe("translator_connect_seconds", labels, record["connect_ms"] / 1000)
+        if record["ttft_ms"] is not None:
+            self._observe("translator_ttft_seconds", labels, record["ttft_ms"] / 1000)
+            if not record["reused_connection"]:
+                self._observe("translator_cold_start_ttft_seconds", labels, record["ttft_ms"] / 1000)
+        self._observe("translator_request_duration_seconds", labels, record["duration_ms"] / 1000)
+
+    def render(self) -> str:
+        lines = []
+        for name in sorted({name for name, _ in self._counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(self._counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{{{self._labels(labels)}}} {value:g}")
+        for name in sorted({name for name, _ in self._histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), (buckets, count, total) in sorted(self._histograms.items()):
+                if metric != name:
+                    continue
+                for bound, value in zip(BUCKETS, buckets):
+                    lines.append(f'{name}_bucket{{{self._labels(labels + (("le", f"{bound:g}"),))}}} {value}')
+                lines.append(f'{name}_bucket{{{self._labels(labels + (("le", "+Inf"),))}}} {count}')
+                lines.append(f"{name}_sum{{{self._labels(labels)}}} {total:g}")
+                lines.append(f"{name}_count{{{self._labels(labels)}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _labels(labels: tuple) -> str:
+        return ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+
+    def write(self, path: Path):
+        # The textfile collector may read at any moment, so replace atomically.
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+        tmp.write_text(self.render(), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+class MetricsLog:
+    def __init__(
+        self,
+        path: Path = METRICS_FILE,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backups: int = DEFAULT_BACKUPS,
+    ):
+        self._path = path
+        self._max_bytes = max_bytes
+        self._backups = backups
+        self._lock = threading.Lock()
+        self._aggregate: PrometheusAggregate | None = None
+
+    def files(self) -> list[Path]:
+        # Oldest first.
+        candidates = [self._path.with_name(f"{self._path.name}.{i}") for i in range(self._backups, 0, -1)]
+        return [p for p in candidates + [self._path] if p.exists()]
+
+    def records(self):
+        for path in self.files():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    def _rotate(self):
+        for i in range(self._backups - 1, 0, -1):
+            src = self._path.with_name(f"{self._path.name}.{i}")
+            if src.exists():
+                os.replace(src, self._path.with_name(f"{self._path.name}.{i + 1}"))
+        os.replace(self._path, self._path.with_name(f"{self._path.name}.1"))
+
+    def append(self, metrics: RequestMetrics):
+        record = metrics.to_dict()
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        textfile = os.environ.get(PROMETHEUS_ENV)
+        with self._lock:
+            try:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                if self._path.exists() and self._path.stat().st_size + len(line) > self._max_bytes:
+                    self._rotate()
+                with open(self._path, "a", encoding="utf-8") as f:
+                    f.write(line)
+                if textfile:
+                    if self._aggregate is None:
+                        self._aggregate = self.aggregate()
+                    else:
+                        self._aggregate.add(record)
+                    self._aggregate.write(Path(textfile))
+            except OSError:
+                traceback.print_exc()
+
+    def aggregate(self) -> PrometheusAggregate:
+        aggregate = PrometheusAggregate()
+        for record in self.records():
+            aggregate.add(record)
+        return aggregate
+
+
+metrics_log = MetricsLog()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m translator_app.metrics")
+    parser.add_argument("--prometheus", help="Write a Prometheus textfile collector file")
+    parser.add_argument("--last", type=int, default=0, help="Print the last N request records")
+    parser.add_argument(
+        "--ttft",
+        action="store_true",
+        help="Compare time to first token on new (cold) and reused (warm) connections",
+    )
+    args = parser.parse_args(argv)
+
+    if args.prometheus:
+        metrics_log.aggregate().write(Path(args.prometheus))
+    if args.last:
+        for record in list(metrics_log.records())[-args.last:]:
+            print(json.dumps(record, ensure_ascii=False))
+    if args.ttft:
+        for line in ttft_report(metrics_log.records()):
+            print(line)
+    if not args.prometheus and not args.last and not args.ttft:
+        sys.stdout.write(metrics_log.aggregate().render())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import deque
+
+from .config import Config
+
+EWMA_ALPHA = 0.2
+ERROR_PENALTY = 4.0
+# Failing endpoints sit out for COOLDOWN * 2^(failures-1) seconds, capped.
+COOLDOWN = 15.0
+MAX_COOLDOWN = 300.0
+# Hedge once the first token is later than this percentile of recent TTFTs.
+HEDGE_PERCENTILE = 0.9
+HEDGE_MIN_SAMPLES = 5
+HEDGE_MIN_DELAY = 0.25
+
+
+class Endpoint:
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        model: str,
+        weight: float = 1.0,
+        rpm: int = 0,
+        tpm: int = 0,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.weight = max(weight, 0.01)
+        # Requests and tokens per minute; 0 means unlimited.
+        self.rpm = rpm
+        self.tpm = tpm
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return (self.base_url, self.model)
+
+    @property
+    def label(self) -> str:
+        return f"{self.model}@{self.base_url}"
+
+
+def configured_endpoints(config: Config) -> list[Endpoint]:
+    endpoints = [Endpoint(config.base_url, config.api_key, config.model, rpm=config.rpm, tpm=config.tpm)]
+    for entry in config.endpoints:
+        if not entry.get("enabled", True) or not entry.get("base_url"):
+            continue
+        endpoints.append(Endpoint(
+            entry["base_url"],
+            entry.get("api_key") or config.api_key,
+            entry.get("model") or config.model,
+            float(entry.get("weight", 1.0)),
+            int(entry.get("rpm", 0)),
+            int(entry.get("tpm", 0)),
+        ))
+    return endpoints
+
+
+class _Health:
+    def __init__(self):
+        self.ttft: float | None = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.recent: deque[float] = deque(maxlen=50)
+
+    def score(self, weight: float) -> float:
+        # Unmeasured endpoints score 0 so they get probed once.
+        return (self.ttft or 0.0) * (1 + ERROR_PENALTY * self.error_rate) / weight
+
+
+class Router:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._health: dict[tuple[str, str], _Health] = {}
+
+    def _get(self, endpoint: Endpoint) -> _Health:
+        return self._health.setdefault(endpoint.key, _Health())
+
+    def rank(self, endpoints: list[Endpoint]) -> list[Endpoint]:
+        now = time.monotonic()
+        with self._lock:
+            return sorted(
+                endpoints,
+                key=lambda e: (self._get(e).cooldown_until > now, self._get(e).score(e.weight)),
+            )
+
+    def hedge_delay(self, endpoint: Endpoint) -> float | None:
+        with self._lock:
+            recent = sorted(self._get(endpoint).recent)
+        if len(recent) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(recent[min(int(len(recent) * HEDGE_PERCENTILE), len(recent) - 1)], HEDGE_MIN_DELAY)
+
+    def record_ttft(self, endpoint: Endpoint, seconds: float):
+        with self._lock:
+            health = self._get(endpoint)
+            health.ttft = seconds if health.ttft is None else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * health.ttft
+            health.recent.append(seconds)
+
+    def record_success(self, endpoint: Endpoint):
+        with self._lock:
+            health = self._get(endpoint)
+            health.error_rate *= 1 - EWMA_ALPHA
+            health.failures = 0
+            health.cooldown_until = 0.0
+
+    def record_failure(self, endpoint: Endpoint):
+        with self._lock:
+            health = self._get(endpoint)
+            health.error_rate = EWMA_ALPHA + (1 - EWMA_ALPHA) * health.error_rate
+            health.failures += 1
+            health.cooldown_until = time.monotonic() + min(COOLDOWN * 2 ** (health.failures - 1), MAX_COOLDOWN)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                f"{model}@{base_url}": {
+                    "ttft_ewma_ms": None if h.ttft is None else round(h.ttft * 1000, 1),
+                    "error_rate": round(h.error_rate, 3),
+                    "cooling_down": h.cooldown_until > now,
+                }
+                for (base_url, model), h in self._health.items()
+            }
+
+
+router = Router()
@@ -0,0 +1,225 @@
+import asyncio
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, TypeVar
+
+from .router import Endpoint
+
+T = TypeVar("T")
+
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+# Concurrent requests per endpoint start here, halve on every 429 and grow back
+# by one after as many successes as the current limit.
+MAX_CONCURRENCY = 8
+
+# Retried on the same endpoint whatever else is configured.
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        # Larger requests than a whole minute's budget would otherwise never fit.
+        amount = min(amount, self.capacity)
+        self._refill()
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+
+def retry_after(error: BaseException) -> float | None:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def is_retryable(error: BaseException) -> bool:
+    if getattr(error, "status_code", None) not in RETRYABLE_STATUS:
+        return False
+    # An exhausted quota also answers 429 but will not recover by waiting.
+    return getattr(error, "code", None) != "insufficient_quota"
+
+
+def backoff(attempt: int, hint: float | None = None) -> float:
+    # Full jitter; a server-provided Retry-After is a lower bound.
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    return max(delay, hint + random.uniform(0, BACKOFF_BASE)) if hint is not None else delay
+
+
+class _Limiter:
+    def __init__(self):
+        self.rpm = 0
+        self.tpm = 0
+        self.requests: TokenBucket | None = None
+        self.tokens: TokenBucket | None = None
+        self.limit = MAX_CONCURRENCY
+        self.active = 0
+        self.queued = 0
+        self.paused_until = 0.0
+        self._successes = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    def configure(self, rpm: int, tpm: int):
+        if rpm != self.rpm:
+            self.rpm, self.requests = rpm, TokenBucket(rpm) if rpm > 0 else None
+        if tpm != self.tpm:
+            self.tpm, self.tokens = tpm, TokenBucket(tpm) if tpm > 0 else None
+
+    async def acquire(self, cost: int):
+        self.queued += 1
+        try:
+            while self.active >= self.limit:
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                try:
+                    await waiter
+                except asyncio.CancelledError:
+                    # Hand a wake-up we may already have been given to the next waiter.
+                    self._wake()
+                    raise
+                finally:
+                    self._waiters.remove(waiter)
+            self.active += 1
+            try:
+                while True:
+                    delay = max(
+                        self.paused_until - time.monotonic(),
+                        self.requests.delay(1) if self.requests else 0.0,
+                        self.tokens.delay(cost) if self.tokens else 0.0,
+                    )
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+            except BaseException:
+                self.release()
+                raise
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(cost)
+        finally:
+            self.queued -= 1
+
+    def release(self):
+        self.active -= 1
+        self._wake()
+
+    def _wake(self):
+        free = self.limit - self.active
+        for waiter in self._waiters:
+            if free <= 0:
+                break
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def on_success(self):
+        self._successes += 1
+        if self._successes >= self.limit:
+            self._successes = 0
+            self.limit = min(self.limit + 1, MAX_CONCURRENCY)
+            self._wake()
+
+    def on_rate_limited(self, pause: float | None):
+        self._successes = 0
+        self.limit = max(self.limit // 2, 1)
+        if pause is not None:
+            # Everyone queued for this endpoint waits, not just the request that got the 429.
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+
+class Scheduler:
+    # Only used from the shared event loop thread, so no locking is needed.
+    def __init__(self):
+        self._limiters: dict[tuple[str, str], _Limiter] = {}
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.retries = 0
+        self.rate_limited = 0
+
+    def _limiter(self, endpoint: Endpoint) -> _Limiter:
+        limiter = self._limiters.setdefault(endpoint.key, _Limiter())
+        limiter.configure(endpoint.rpm, endpoint.tpm)
+        return limiter
+
+    async def run(
+        self,
+        endpoint: Endpoint,
+        cost: int,
+        call: Callable[[float], Awaitable[T]],
+        retryable: Callable[[BaseException], bool],
+    ) -> T:
+        limiter = self._limiter(endpoint)
+        attempt = 0
+        while True:
+            queued = time.perf_counter()
+            await limiter.acquire(cost)
+            waited = time.perf_counter() - queued
+            self.waits += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            try:
+                result = await call(waited)
+            except Exception as e:
+                hint = retry_after(e)
+                if is_rate_limited(e):
+                    self.rate_limited += 1
+                    limiter.on_rate_limited(hint)
+                if attempt >= MAX_RETRIES or not retryable(e):
+                    raise
+            else:
+                limiter.on_success()
+                return result
+            finally:
+                limiter.release()
+            self.retries += 1
+            await asyncio.sleep(backoff(attempt, hint))
+            attempt += 1
+
+    def stats(self) -> dict:
+        limiters = list(self._limiters.values())
+        return {
+            "queued": sum(limiter.queued for limiter in limiters),
+            "active": sum(limiter.active for limiter in limiters),
+            "wait_ms_avg": self.wait_seconds / self.waits * 1000 if self.waits else 0.0,
+            "wait_ms_max": self.max_wait_seconds * 1000,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+        }
+
+
+scheduler = Scheduler()
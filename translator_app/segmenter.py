@@ -0,0 +1,134 @@
+import re
+
+DEFAULT_SEGMENT_TOKENS = 1200
+
+_PARAGRAPH_BREAK = re.compile(r"(\n[ \t]*\n\s*)")
+_SENTENCE_END = re.compile(r"(?<=[。！？；!?;])(\s*)|(?<=[.])(\s+)")
+_CJK = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]")
+# A period after these, or after a lone letter, is taken as an abbreviation, not a sentence end.
+_ABBREVIATION = re.compile(
+    r"(?:\b(?:Mr|Mrs|Ms|Dr|Prof|Sr|Jr|St|Mt|No|vs|etc|e\.g|i\.e|cf|Fig|Vol|Inc|Ltd|Co)|(?<!\w)[A-Za-z])\.$"
+)
+# Chinese and Japanese sentences follow each other without a space.
+_UNSPACED_END = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3000-\u303f\uff00-\uffef]$")
+
+
+class Segment:
+    def __init__(self, source: str, separator: str = ""):
+        self.source = source
+        self.separator = separator
+
+
+def estimate_tokens(text: str) -> int:
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _split_sentences(paragraph: str) -> list[tuple[str, str]]:
+    pieces = []
+    start = 0
+    for match in _SENTENCE_END.finditer(paragraph):
+        end = match.start()
+        if end <= start or _ABBREVIATION.search(paragraph, start, end):
+            continue
+        pieces.append((paragraph[start:end], match.group(0)))
+        start = match.end()
+    if start < len(paragraph):
+        pieces.append((paragraph[start:], ""))
+    return pieces
+
+
+def join_separator(previous: str, separator: str) -> str:
+    # The separator to put after a translated sentence: the source's spacing,
+    # except within a paragraph after a sentence in a script written without spaces.
+    if "\n" not in separator and _UNSPACED_END.search(previous.rstrip()):
+        return ""
+    return separator
+
+
+def split_sentences(text: str) -> list[tuple[str, str]]:
+    # Every sentence with the whitespace (or paragraph break) after it; joined back they give text.
+    parts = _PARAGRAPH_BREAK.split(text)
+    sentences = []
+    for i in range(0, len(parts), 2):
+        separator = parts[i + 1] if i + 1 < len(parts) else ""
+        pieces = _split_sentences(parts[i])
+        if not pieces:
+            if sentences:
+                last, last_sep = sentences[-1]
+                sentences[-1] = (last, last_sep + parts[i] + separator)
+            else:
+                sentences.append((parts[i], separator))
+            continue
+        last, last_sep = pieces[-1]
+        pieces[-1] = (last, last_sep + separator)
+        sentences.extend(pieces)
+    return sentences
+
+
+def _split_hard(text: str, max_tokens: int) -> list[tuple[str, str]]:
+    max_chars = max(max_tokens, 1)
+    if not _CJK.search(text):
+        max_chars *= 4
+    return [(text[i:i + max_chars], "") for i in range(0, len(text), max_chars)]
+
+
+def _units(text: str, max_tokens: int) -> list[tuple[str, str]]:
+    parts = _PARAGRAPH_BREAK.split(text)
+    units = []
+    for i in range(0, len(parts), 2):
+        paragraph = parts[i]
+        separator = parts[i + 1] if i + 1 < len(parts) else ""
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            units.append((paragraph, separator))
+            continue
+        sentences = []
+        for sentence, sentence_sep in _split_sentences(paragraph):
+            if estimate_tokens(sentence) <= max_tokens:
+                sentences.append((sentence, sentence_sep))
+            else:
+                sentences.extend(_split_hard(sentence, max_tokens))
+                if sentences and sentence_sep:
+                    last, _ = sentences[-1]
+                    sentences[-1] = (last, sentence_sep)
+        if sentences:
+            last, last_sep = sentences[-1]
+            sentences[-1] = (last, last_sep + separator)
+        units.extend(sentences)
+    return units
+
+
+def is_paragraph_break(separator: str) -> bool:
+    return _PARAGRAPH_BREAK.fullmatch(separator) is not None
+
+
+def split_paragraphs(text: str) -> list[str]:
+    return _PARAGRAPH_BREAK.split(text.strip())[::2]
+
+
+def split_units(text: str, max_tokens: int = DEFAULT_SEGMENT_TOKENS) -> list[tuple[str, str]]:
+    return _units(text, max_tokens)
+
+
+def join_units(units: list[tuple[str, str]]) -> Segment:
+    source = "".join(unit + unit_sep for unit, unit_sep in units[:-1]) + units[-1][0]
+    return Segment(source, units[-1][1])
+
+
+def pack_units(units: list[tuple[str, str]], max_tokens: int = DEFAULT_SEGMENT_TOKENS) -> list[list[tuple[str, str]]]:
+    groups: list[list[tuple[str, str]]] = []
+    budget = 0
+    for unit in units:
+        tokens = estimate_tokens(unit[0])
+        if not groups or budget + tokens > max_tokens:
+            groups.append([])
+            budget = 0
+        groups[-1].append(unit)
+        budget += tokens
+    return groups
+
+
+def split_segments(text: str, max_tokens: int = DEFAULT_SEGMENT_TOKENS) -> list[Segment]:
+    return [join_units(group) for group in pack_units(_units(text, max_tokens), max_tokens)]
@@ -1,18 +1,29 @@
+from pathlib import Path
+
+from PySide6.QtCore import Qt
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
     QTextEdit, QPushButton, QTabWidget, QWidget, QMessageBox,
-    QFormLayout,
+    QFormLayout, QTableWidget, QTableWidgetItem, QHeaderView, QCheckBox,
+    QSpinBox, QFileDialog,
 )
 
 from .config import Config, DEFAULT_SYSTEM_PROMPT
-from .api_client import TestConnectionWorker
+from .api_client import ConnectionTestHandle, GlossaryImportHandle
+from .clients import client_manager
+from .engine import REQUEST_TIMEOUT
+from .glossary import glossary
+from .router import Endpoint, configured_endpoints, router
+
+ENDPOINT_COLUMNS = ["Base URL", "API Key", "模型", "权重", "RPM", "TPM", "状态"]
 
 
 class SettingsDialog(QDialog):
     def __init__(self, config: Config, parent=None):
         super().__init__(parent)
         self._config = config
-        self._test_worker: TestConnectionWorker | None = None
+        self._test_worker: ConnectionTestHandle | None = None
+        self._import_worker: GlossaryImportHandle | None = None
         self.setWindowTitle("设置")
         self.setMinimumSize(520, 420)
         self._init_ui()
@@ -24,7 +35,9 @@ class SettingsDialog(QDialog):
 
         self._tabs = QTabWidget()
         self._tabs.addTab(self._create_api_tab(), "API 设置")
+        self._tabs.addTab(self._create_endpoints_tab(), "多端点")
         self._tabs.addTab(self._create_prompt_tab(), "提示词设置")
+        self._tabs.addTab(self._create_glossary_tab(), "术语表")
         layout.addWidget(self._tabs)
 
         btn_layout = QHBoxLayout()
@@ -58,6 +71,30 @@ class SettingsDialog(QDialog):
         self._edit_model.setPlaceholderText("gpt-4o-mini")
         form.addRow("模型:", self._edit_model)
 
+        self._spin_rpm = QSpinBox()
+        self._spin_rpm.setRange(0, 1_000_000)
+        self._spin_rpm.setSpecialValueText("不限")
+        form.addRow("每分钟请求数:", self._spin_rpm)
+
+        self._spin_tpm = QSpinBox()
+        self._spin_tpm.setRange(0, 100_000_000)
+        self._spin_tpm.setSingleStep(1000)
+        self._spin_tpm.setSpecialValueText("不限")
+        form.addRow("每分钟 tokens:", self._spin_tpm)
+
+        self._check_warmup = QCheckBox("启动时和保存设置后预热连接")
+        form.addRow("", self._check_warmup)
+        self._check_warmup_completion = QCheckBox("预热时发送一次最小补全请求（让本地模型提前加载）")
+        form.addRow("", self._check_warmup_completion)
+
+        self._spin_keep_warm = QSpinBox()
+        self._spin_keep_warm.setRange(0, 3600)
+        self._spin_keep_warm.setSingleStep(30)
+        self._spin_keep_warm.setSuffix(" 秒")
+        self._spin_keep_warm.setSpecialValueText("关闭")
+        self._spin_keep_warm.setToolTip("端点空闲超过该时长后重新预热")
+        form.addRow("保持预热:", self._spin_keep_warm)
+
         self._btn_test = QPushButton("测试连接")
         self._btn_test.setFixedWidth(120)
         self._btn_test.clicked.connect(self._on_test_connection)
@@ -65,6 +102,114 @@ class SettingsDialog(QDialog):
 
         return tab
 
+    def _create_endpoints_tab(self) -> QWidget:
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        layout.setContentsMargins(12, 16, 12, 12)
+        layout.setSpacing(10)
+
+        help_label = QLabel(
+            "除主端点外的其他 OpenAI 兼容端点。每次请求发往首字最快且健康的端点，"
+            "连接失败或 5xx 错误时自动切换。权重越高越优先；API Key 和模型留空则沿用主端点；"
+            "RPM/TPM 为每分钟请求数和 tokens 上限，0 表示不限。"
+        )
+        help_label.setWordWrap(True)
+        help_label.setStyleSheet("color: #666; font-size: 9pt;")
+        layout.addWidget(help_label)
+
+        self._table_endpoints = QTableWidget(0, len(ENDPOINT_COLUMNS))
+        self._table_endpoints.setHorizontalHeaderLabels(ENDPOINT_COLUMNS)
+        self._table_endpoints.verticalHeader().setVisible(False)
+        header = self._table_endpoints.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        for column in range(1, len(ENDPOINT_COLUMNS)):
+            header.setSectionResizeMode(column, QHeaderView.ResizeMode.ResizeToContents)
+        layout.addWidget(self._table_endpoints)
+
+        btn_row = QHBoxLayout()
+        self._check_hedge = QCheckBox("首字迟迟未到时向第二个端点发送对冲请求")
+        btn_row.addWidget(self._check_hedge)
+        btn_row.addStretch()
+        self._btn_add_endpoint = QPushButton("添加")
+        self._btn_add_endpoint.setFixedWidth(80)
+        self._btn_add_endpoint.clicked.connect(lambda: self._add_endpoint_row({}))
+        btn_row.addWidget(self._btn_add_endpoint)
+        self._btn_remove_endpoint = QPushButton("删除")
+        self._btn_remove_endpoint.setFixedWidth(80)
+        self._btn_remove_endpoint.clicked.connect(self._on_remove_endpoint)
+        btn_row.addWidget(self._btn_remove_endpoint)
+        layout.addLayout(btn_row)
+
+        return tab
+
+    def _add_endpoint_row(self, entry: dict):
+        row = self._table_endpoints.rowCount()
+        self._table_endpoints.insertRow(row)
+        base_url = QTableWidgetItem(entry.get("base_url", ""))
+        base_url.setFlags(base_url.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+        base_url.setCheckState(
+            Qt.CheckState.Checked if entry.get("enabled", True) else Qt.CheckState.Unchecked
+        )
+        self._table_endpoints.setItem(row, 0, base_url)
+        self._table_endpoints.setItem(row, 1, QTableWidgetItem(entry.get("api_key", "")))
+        self._table_endpoints.setItem(row, 2, QTableWidgetItem(entry.get("model", "")))
+        self._table_endpoints.setItem(row, 3, QTableWidgetItem(f"{entry.get('weight', 1.0):g}"))
+        self._table_endpoints.setItem(row, 4, QTableWidgetItem(str(entry.get("rpm", 0))))
+        self._table_endpoints.setItem(row, 5, QTableWidgetItem(str(entry.get("tpm", 0))))
+        health = router.snapshot().get(
+            Endpoint(entry.get("base_url", ""), "", entry.get("model") or self._config.model).label
+        )
+        status = QTableWidgetItem(self._describe_health(health))
+        status.setFlags(status.flags() & ~Qt.ItemFlag.ItemIsEditable)
+        self._table_endpoints.setItem(row, 6, status)
+
+    @staticmethod
+    def _describe_health(health: dict | None) -> str:
+        if health is None:
+            return "未使用"
+        if health["cooling_down"]:
+            return "暂停（出错）"
+        parts = []
+        if health["ttft_ewma_ms"] is not None:
+            parts.append(f"首字 {health['ttft_ewma_ms']:.0f}ms")
+        parts.append(f"错误率 {health['error_rate']:.0%}")
+        return " · ".join(parts)
+
+    def _on_remove_endpoint(self):
+        row = self._table_endpoints.currentRow()
+        if row >= 0:
+            self._table_endpoints.removeRow(row)
+
+    def _cell(self, row: int, column: int) -> str:
+        item = self._table_endpoints.item(row, column)
+        return item.text().strip() if item is not None else ""
+
+    def _endpoint_entries(self) -> list[dict]:
+        entries = []
+        for row in range(self._table_endpoints.rowCount()):
+            if not self._cell(row, 0):
+                continue
+            try:
+                weight = float(self._cell(row, 3) or 1.0)
+            except ValueError:
+                weight = 1.0
+            limits = []
+            for column in (4, 5):
+                try:
+                    limits.append(max(int(self._cell(row, column) or 0), 0))
+                except ValueError:
+                    limits.append(0)
+            entries.append({
+                "base_url": self._cell(row, 0),
+                "api_key": self._cell(row, 1),
+                "model": self._cell(row, 2),
+                "weight": weight,
+                "rpm": limits[0],
+                "tpm": limits[1],
+                "enabled": self._table_endpoints.item(row, 0).checkState() == Qt.CheckState.Checked,
+            })
+        return entries
+
     def _create_prompt_tab(self) -> QWidget:
         tab = QWidget()
         layout = QVBoxLayout(tab)
@@ -83,6 +228,9 @@ class SettingsDialog(QDialog):
         self._edit_prompt.setPlaceholderText("输入系统提示词...")
         layout.addWidget(self._edit_prompt)
 
+        self._check_system_message = QCheckBox("作为独立的 system 消息发送（提示词不变时可命中服务端前缀缓存）")
+        layout.addWidget(self._check_system_message)
+
         btn_row = QHBoxLayout()
         btn_row.addStretch()
         self._btn_restore = QPushButton("恢复默认")
@@ -93,18 +241,115 @@ class SettingsDialog(QDialog):
 
         return tab
 
+    def _create_glossary_tab(self) -> QWidget:
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        layout.setContentsMargins(12, 16, 12, 12)
+        layout.setSpacing(10)
+
+        help_label = QLabel(
+            "从 CSV 或 TSV 文件导入术语，每行：原文, 译文[, 目标语言]。\n"
+            "未指定目标语言的术语适用于所有语言。每次请求只附带原文中出现的术语。"
+        )
+        help_label.setWordWrap(True)
+        help_label.setStyleSheet("color: #666; font-size: 9pt;")
+        layout.addWidget(help_label)
+
+        self._check_glossary = QCheckBox("翻译时使用术语表")
+        layout.addWidget(self._check_glossary)
+
+        self._label_glossary = QLabel()
+        layout.addWidget(self._label_glossary)
+        layout.addStretch()
+
+        btn_row = QHBoxLayout()
+        btn_row.addStretch()
+        self._btn_import_glossary = QPushButton("导入...")
+        self._btn_import_glossary.setFixedWidth(100)
+        self._btn_import_glossary.clicked.connect(self._on_import_glossary)
+        btn_row.addWidget(self._btn_import_glossary)
+        self._btn_clear_glossary = QPushButton("清空")
+        self._btn_clear_glossary.setFixedWidth(100)
+        self._btn_clear_glossary.clicked.connect(self._on_clear_glossary)
+        btn_row.addWidget(self._btn_clear_glossary)
+        layout.addLayout(btn_row)
+
+        return tab
+
+    def _update_glossary_count(self):
+        self._label_glossary.setText(f"术语表共 {glossary.count()} 条")
+
+    def _on_import_glossary(self):
+        path, _ = QFileDialog.getOpenFileName(self, "导入术语表", "", "术语表 (*.csv *.tsv *.txt)")
+        if not path:
+            return
+        self._btn_import_glossary.setEnabled(False)
+        self._btn_import_glossary.setText("导入中...")
+        self._btn_clear_glossary.setEnabled(False)
+
+        self._import_worker = GlossaryImportHandle(Path(path))
+        self._import_worker.imported.connect(self._on_glossary_imported)
+        self._import_worker.error_occurred.connect(self._on_glossary_import_error)
+        self._import_worker.finished.connect(self._on_glossary_import_done)
+        self._import_worker.start()
+
+    def _on_glossary_imported(self, count: int):
+        self._update_glossary_count()
+        QMessageBox.information(self, "导入完成", f"已导入 {count} 条术语。")
+
+    def _on_glossary_import_error(self, msg: str):
+        QMessageBox.warning(self, "导入失败", msg)
+
+    def _on_glossary_import_done(self):
+        self._btn_import_glossary.setEnabled(True)
+        self._btn_import_glossary.setText("导入...")
+        self._btn_clear_glossary.setEnabled(True)
+
+    def _on_clear_glossary(self):
+        answer = QMessageBox.question(self, "清空术语表", "确定删除全部术语吗？")
+        if answer == QMessageBox.StandardButton.Yes:
+            glossary.clear()
+            self._update_glossary_count()
+
     def _load_values(self):
         self._edit_api_key.setText(self._config.api_key)
         self._edit_base_url.setText(self._config.base_url)
         self._edit_model.setText(self._config.model)
+        self._spin_rpm.setValue(self._config.rpm)
+        self._spin_tpm.setValue(self._config.tpm)
+        self._check_warmup.setChecked(self._config.warmup)
+        self._check_warmup_completion.setChecked(self._config.warmup_completion)
+        self._spin_keep_warm.setValue(self._config.keep_warm_interval)
         self._edit_prompt.setPlainText(self._config.system_prompt)
+        self._check_system_message.setChecked(self._config.system_message)
+        for entry in self._config.endpoints:
+            self._add_endpoint_row(entry)
+        self._check_hedge.setChecked(self._config.hedge_requests)
+        self._check_glossary.setChecked(self._config.use_glossary)
+        self._update_glossary_count()
 
     def _on_save(self):
+        old_endpoint = (self._config.api_key, self._config.base_url, self._config.endpoints)
         self._config.api_key = self._edit_api_key.text().strip()
         self._config.base_url = self._edit_base_url.text().strip() or "https://api.openai.com/v1"
         self._config.model = self._edit_model.text().strip() or "gpt-4o-mini"
         self._config.system_prompt = self._edit_prompt.toPlainText().strip() or DEFAULT_SYSTEM_PROMPT
+        self._config.system_message = self._check_system_message.isChecked()
+        self._config.rpm = self._spin_rpm.value()
+        self._config.tpm = self._spin_tpm.value()
+        self._config.warmup = self._check_warmup.isChecked()
+        self._config.warmup_completion = self._check_warmup_completion.isChecked()
+        self._config.keep_warm_interval = self._spin_keep_warm.value()
+        self._config.endpoints = self._endpoint_entries()
+        self._config.hedge_requests = self._check_hedge.isChecked()
+        self._config.use_glossary = self._check_glossary.isChecked()
         self._config.save()
+        if (self._config.api_key, self._config.base_url, self._config.endpoints) != old_endpoint:
+            # Clients for endpoints still configured keep their warm connections.
+            client_manager.reset({
+                (endpoint.base_url, endpoint.api_key, REQUEST_TIMEOUT)
+                for endpoint in configured_endpoints(self._config)
+            })
         self.accept()
 
     def _on_restore_default(self):
@@ -122,7 +367,7 @@ class SettingsDialog(QDialog):
         self._btn_test.setEnabled(False)
         self._btn_test.setText("测试中...")
 
-        self._test_worker = TestConnectionWorker(api_key, base_url, model)
+        self._test_worker = ConnectionTestHandle(api_key, base_url, model)
         self._test_worker.success.connect(self._on_test_success)
         self._test_worker.error_occurred.connect(self._on_test_error)
         self._test_worker.finished.connect(self._on_test_done)
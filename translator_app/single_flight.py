@@ -0,0 +1,85 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+# How long a stream nobody listens to any more is kept alive, so that an
+# identical request submitted right after a cancel (double Ctrl+Enter) can
+# pick it up instead of starting over.
+ORPHAN_GRACE = 0.25
+
+
+class _Flight:
+    def __init__(self):
+        self.chunks: list[str] = []
+        self.listeners: list[Callable[[str], None]] = []
+        # Records of the requests sent for this flight, shared by everyone who joined it.
+        self.requests: list = []
+        self.task: asyncio.Future | None = None
+
+    def emit(self, text: str):
+        self.chunks.append(text)
+        for listener in list(self.listeners):
+            listener(text)
+
+
+class SingleFlight:
+    # Only used from the shared event loop thread, so no locking is needed.
+    def __init__(self):
+        self._flights: dict[Hashable, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(
+        self,
+        key: Hashable,
+        request: Callable[[Callable[[str], None], list], Awaitable[str]],
+        on_text: Callable[[str], None],
+        requests: list,
+    ) -> tuple[str, bool]:
+        # The result, and whether it came from a flight someone else started.
+        # The flight's request records are added to `requests` either way.
+        flight = self._flights.get(key)
+        joined = flight is not None
+        if flight is None:
+            flight = _Flight()
+            flight.task = asyncio.ensure_future(request(flight.emit, flight.requests))
+            flight.task.add_done_callback(lambda task: self._finished(key, flight))
+            self._flights[key] = flight
+            self.started += 1
+        else:
+            self.coalesced += 1
+            if flight.chunks:
+                on_text("".join(flight.chunks))
+
+        flight.listeners.append(on_text)
+        try:
+            return await asyncio.shield(flight.task), joined
+        finally:
+            requests.extend(flight.requests)
+            flight.listeners.remove(on_text)
+            if not flight.listeners and not flight.task.done():
+                asyncio.get_running_loop().call_later(ORPHAN_GRACE, self._abandon, key, flight)
+
+    def _abandon(self, key: Hashable, flight: _Flight):
+        if not flight.listeners:
+            self._forget(key, flight)
+            flight.task.cancel()
+
+    def _finished(self, key: Hashable, flight: _Flight):
+        self._forget(key, flight)
+        if not flight.task.cancelled():
+            # Mark the error as retrieved even if every listener has gone.
+            flight.task.exception()
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
+
+
+single_flight = SingleFlight()
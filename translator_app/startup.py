@@ -0,0 +1,116 @@
+"""Cold-start report. Usage: python -m translator_app.startup [--runs 5] [--budget 1200]"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROBE_ENV = "TRANSLATOR_STARTUP_PROBE"
+MAIN_SCRIPT = Path(__file__).resolve().parent.parent / "main.py"
+DEFAULT_BUDGET_MS = 1200.0
+
+
+def install_probe(app, window, main_started: float):
+    # Imported here so that the report itself never pulls Qt into the parent process.
+    from PySide6.QtCore import QEvent, QObject, QTimer
+
+    launched = float(os.environ[PROBE_ENV])
+    window_created = time.time()
+
+    class _FirstPaintFilter(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Type.Paint:
+                painted = time.time()
+                window.removeEventFilter(self)
+                print(json.dumps({
+                    "interpreter_and_imports_ms": (main_started - launched) * 1000,
+                    "window_created_ms": (window_created - launched) * 1000,
+                    "first_paint_ms": (painted - launched) * 1000,
+                    "modules": sorted(
+                        name for name in ("openai", "httpx", "translator_app.settings")
+                        if name in sys.modules
+                    ),
+                }), flush=True)
+                QTimer.singleShot(0, app.quit)
+            return False
+
+    window._startup_probe = _FirstPaintFilter(window)
+    window.installEventFilter(window._startup_probe)
+
+
+def _probe_once() -> dict:
+    env = dict(os.environ, **{PROBE_ENV: repr(time.time())})
+    out = subprocess.run(
+        [sys.executable, str(MAIN_SCRIPT)],
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    for line in out.stdout.splitlines():
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"startup probe produced no report:\n{out.stderr}")
+
+
+def _import_breakdown(top: int) -> list[tuple[int, str]]:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=str(MAIN_SCRIPT.parent),
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    # -X importtime prints a module after its own imports, so the direct
+    # children of `main` are the depth-1 rows seen just before it.
+    rows = []
+    children = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((int(cumulative), name.strip()))
+        elif depth == 0:
+            if name.strip() == "main":
+                rows = [(int(cumulative), "main (total)")] + children
+            children = []
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m translator_app.startup")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to measure")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_MS, help="Allowed median time-to-first-paint in ms")
+    parser.add_argument("--top", type=int, default=15, help="Imports to list")
+    args = parser.parse_args(argv)
+
+    print("Imports of main.py by cumulative time (-X importtime):")
+    for cumulative, name in _import_breakdown(args.top):
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    probes = [_probe_once() for _ in range(args.runs)]
+    print()
+    for key in ("interpreter_and_imports_ms", "window_created_ms", "first_paint_ms"):
+        values = [probe[key] for probe in probes]
+        print(f"{key:28} median {statistics.median(values):8.1f} ms   max {max(values):8.1f} ms")
+    eager = sorted({name for probe in probes for name in probe["modules"]})
+    if eager:
+        print(f"Loaded before first paint: {', '.join(eager)}")
+
+    median_paint = statistics.median(probe["first_paint_ms"] for probe in probes)
+    if median_paint > args.budget:
+        print(f"\nOver budget: {median_paint:.1f} ms > {args.budget:.1f} ms")
+        return 1
+    print(f"\nWithin budget: {median_paint:.1f} ms <= {args.budget:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
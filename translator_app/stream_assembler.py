@@ -0,0 +1,63 @@
+UNKNOWN = "unknown"
+INCREMENTAL = "incremental"
+CUMULATIVE = "cumulative"
+
+# Cumulative deltas are checked against this many trailing characters only,
+# which keeps each feed() proportional to the new text instead of the output.
+_TAIL = 64
+
+
+class StreamAssembler:
+    def __init__(self):
+        self._parts: list[str] = []
+        self._length = 0
+        self._tail = ""
+        self._mode = UNKNOWN
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _append(self, new_text: str) -> str:
+        self._parts.append(new_text)
+        self._length += len(new_text)
+        return new_text
+
+    def feed(self, delta: str) -> str:
+        if self._mode == INCREMENTAL:
+            if delta:
+                self._parts.append(delta)
+                self._length += len(delta)
+            return delta
+
+        if not delta:
+            return ""
+
+        if self._mode == CUMULATIVE:
+            if len(delta) <= self._length:
+                return ""
+            if delta.startswith(self._tail, self._length - len(self._tail)):
+                self._tail = delta[-_TAIL:]
+                return self._append(delta[self._length:])
+            self._tail = (self._tail + delta)[-_TAIL:]
+            return self._append(delta)
+
+        if not self._parts:
+            self._tail = delta[-_TAIL:]
+            return self._append(delta)
+        text = self.text()
+        if len(delta) > self._length and delta.startswith(text):
+            self._mode = CUMULATIVE
+            self._tail = delta[-_TAIL:]
+            return self._append(delta[self._length:])
+        # A second delta equal to the first is a repeat ("\n\n" twice), not an unchanged snapshot.
+        self._mode = INCREMENTAL
+        return self._append(delta)
+
+    def text(self) -> str:
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
@@ -0,0 +1,119 @@
+import statistics
+import threading
+import time
+
+from PySide6.QtCore import QObject, Qt, QTimer
+from PySide6.QtGui import QTextCursor
+from PySide6.QtWidgets import QTextEdit
+
+FRAME_MS = 16
+
+
+class StreamRenderer(QObject):
+    def __init__(self, edit: QTextEdit, coalesce: bool = True, parent: QObject | None = None):
+        super().__init__(parent)
+        self._edit = edit
+        self._coalesce = coalesce
+        self._lock = threading.Lock()
+        self._pending: list[str] = []
+        self._timer = QTimer(self)
+        self._timer.setInterval(FRAME_MS)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._on_frame)
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._emitted = 0
+        self._rendered = 0
+        self._max_backlog = 0
+        self._edits = 0
+        self._frame_intervals: list[float] = []
+        self._edit_times: list[float] = []
+        self._last_frame = 0.0
+        self._first_chunk: float | None = None
+
+    @property
+    def first_chunk_time(self) -> float | None:
+        return self._first_chunk
+
+    def attach(self, signal):
+        if self._coalesce:
+            signal.connect(self.append, Qt.ConnectionType.DirectConnection)
+        else:
+            signal.connect(self._note_emitted, Qt.ConnectionType.DirectConnection)
+            signal.connect(self._render_now)
+
+    def start(self):
+        with self._lock:
+            self._pending.clear()
+        self._reset_stats()
+        self._last_frame = time.perf_counter()
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+        self.flush()
+
+    def append(self, text: str):
+        # Called on the worker thread; the GUI thread picks it up on the next frame.
+        with self._lock:
+            if self._first_chunk is None:
+                self._first_chunk = time.perf_counter()
+            self._pending.append(text)
+            self._emitted += 1
+            self._max_backlog = max(self._max_backlog, len(self._pending))
+
+    def _note_emitted(self, text: str):
+        with self._lock:
+            if self._first_chunk is None:
+                self._first_chunk = time.perf_counter()
+            self._emitted += 1
+            self._max_backlog = max(self._max_backlog, self._emitted - self._rendered)
+
+    def _render_now(self, text: str):
+        with self._lock:
+            self._rendered += 1
+        self._insert(text)
+
+    def _on_frame(self):
+        now = time.perf_counter()
+        self._frame_intervals.append((now - self._last_frame) * 1000)
+        self._last_frame = now
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            text = "".join(self._pending)
+            self._rendered += len(self._pending)
+            self._pending.clear()
+        self._insert(text)
+
+    def _insert(self, text: str):
+        started = time.perf_counter()
+        scroll_bar = self._edit.verticalScrollBar()
+        follow = scroll_bar.value() >= scroll_bar.maximum()
+        cursor = QTextCursor(self._edit.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+        if follow:
+            scroll_bar.setValue(scroll_bar.maximum())
+        self._edits += 1
+        self._edit_times.append((time.perf_counter() - started) * 1000)
+
+    def stats(self) -> dict:
+        intervals = sorted(self._frame_intervals)
+        edit_times = self._edit_times
+        return {
+            "mode": "coalesced" if self._coalesce else "per-chunk",
+            "chunks": self._emitted,
+            "document_edits": self._edits,
+            "max_backlog": self._max_backlog,
+            "frames": len(intervals),
+            "frame_interval_p50_ms": statistics.median(intervals) if intervals else 0.0,
+            "frame_interval_p95_ms": intervals[int(len(intervals) * 0.95)] if intervals else 0.0,
+            "frame_interval_max_ms": intervals[-1] if intervals else 0.0,
+            "edit_time_total_ms": sum(edit_times),
+            "edit_time_max_ms": max(edit_times) if edit_times else 0.0,
+        }
@@ -0,0 +1,51 @@
+import httpx
+from openai import DEFAULT_CONNECTION_LIMITS
+
+
+class _DrainingStream(httpx.AsyncByteStream):
+    # The SDK closes a streaming response as soon as it sees `data: [DONE]`,
+    # before the chunked-encoding terminator has been read, which makes the
+    # pool discard the connection. Reading that last empty chunk on close
+    # lets the connection go back into the pool.
+    def __init__(self, stream: httpx.AsyncByteStream):
+        self._stream = stream
+        self._tail = b""
+        self._exhausted = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._tail = (self._tail + chunk)[-16:]
+            yield chunk
+        self._exhausted = True
+
+    async def aclose(self):
+        try:
+            if not self._exhausted and self._tail.rstrip().endswith(b"[DONE]"):
+                async for _ in self._stream:
+                    pass
+        finally:
+            await self._stream.aclose()
+
+
+# httpx drops idle connections after 5 seconds by default, long before the next
+# translation usually comes along; servers that close them sooner are detected on reuse.
+KEEPALIVE_EXPIRY = 90.0
+
+
+class KeepAliveTransport(httpx.AsyncBaseTransport):
+    def __init__(self):
+        self._transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=DEFAULT_CONNECTION_LIMITS.max_connections,
+                max_keepalive_connections=DEFAULT_CONNECTION_LIMITS.max_keepalive_connections,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            )
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self._transport.handle_async_request(request)
+        response.stream = _DrainingStream(response.stream)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
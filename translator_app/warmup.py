@@ -0,0 +1,107 @@
+import asyncio
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from .config import Config
+from .engine import REQUEST_TIMEOUT, build_messages, build_system_prompt
+from .event_loop import event_loop
+from .router import Endpoint, configured_endpoints
+
+# How often keep-warm looks for endpoints that have been idle for the interval.
+KEEP_WARM_CHECK = 5.0
+WARMUP_TEXT = "Hi"
+
+
+class WarmupResult:
+    def __init__(self, endpoint: Endpoint):
+        self.endpoint = endpoint
+        self.finished = time.time()
+        self.connect_ms: float | None = None
+        self.completion_ms: float | None = None
+        self.error: str | None = None
+
+
+class Warmer:
+    # start() and stop() are called from the GUI thread; the rest runs on the shared event loop.
+    def __init__(self):
+        self._future: Future | None = None
+        self.results: dict[tuple[str, str], WarmupResult] = {}
+        self.on_warmed: Callable[[list[WarmupResult]], None] = lambda results: None
+
+    def start(self, config: Config) -> Future | None:
+        # Restarted after every settings change; the previous keep-warm loop stops.
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+        if not config.warmup or not config.api_key:
+            return None
+        self._future = event_loop.submit(self._run(config))
+        return self._future
+
+    def stop(self):
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    async def _run(self, config: Config):
+        self.on_warmed(await self.warm(config, configured_endpoints(config)))
+        interval = config.keep_warm_interval
+        if interval <= 0:
+            return
+        from .clients import client_manager
+
+        while True:
+            await asyncio.sleep(min(interval, KEEP_WARM_CHECK))
+            idle = [
+                endpoint for endpoint in configured_endpoints(config)
+                if client_manager.idle_seconds(endpoint.base_url, endpoint.api_key, REQUEST_TIMEOUT) >= interval
+            ]
+            if idle:
+                await self.warm(config, idle)
+
+    async def warm(self, config: Config, endpoints: list[Endpoint]) -> list[WarmupResult]:
+        results = await asyncio.gather(*[self._warm_one(config, endpoint) for endpoint in endpoints])
+        for result in results:
+            self.results[result.endpoint.key] = result
+        return results
+
+    async def _warm_one(self, config: Config, endpoint: Endpoint) -> WarmupResult:
+        from openai import APIConnectionError, APIStatusError
+        from .clients import client_manager
+
+        result = WarmupResult(endpoint)
+        # Creating the client also pays for importing the SDK, so the first translation does not.
+        async with client_manager.lease(endpoint.base_url, endpoint.api_key, REQUEST_TIMEOUT) as client:
+            # Only used here, so not loaded by client_manager; keep its import out of connect_ms.
+            list_models = client.models.list
+            started = time.perf_counter()
+            try:
+                # Any HTTP answer will do: it leaves a connected, TLS-ready socket in the pool.
+                await list_models()
+            except APIStatusError:
+                pass
+            except APIConnectionError as e:
+                result.error = str(e)
+                return result
+            result.connect_ms = (time.perf_counter() - started) * 1000
+
+            if config.warmup_completion:
+                # A one-token completion makes local servers load the model. With the
+                # system-message layout it also puts the prompt into the prefix cache.
+                system_prompt = build_system_prompt(config, config.target_lang)
+                started = time.perf_counter()
+                try:
+                    await client.chat.completions.create(
+                        model=endpoint.model,
+                        max_tokens=1,
+                        messages=build_messages(system_prompt, WARMUP_TEXT, system_message=config.system_message),
+                    )
+                    result.completion_ms = (time.perf_counter() - started) * 1000
+                except (APIConnectionError, APIStatusError) as e:
+                    result.error = str(e)
+        result.finished = time.time()
+        return result
+
+
+warmer = Warmer()